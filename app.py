@@ -1,18 +1,30 @@
-from flask import Flask, render_template, request, jsonify, send_file, url_for
+import time
+STARTED_AT = time.time()  # for cold-start reporting
+
+from flask import (Flask, Request, render_template, request, jsonify, send_file, url_for, Response,
+                   stream_with_context, copy_current_request_context)
 import os
-import cv2
-import numpy as np
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 import json
 from datetime import datetime
 import base64
-from scripts.main_yolo import HumanCounter
+# cv2, numpy and the detectors are imported lazily (see warm_up) so the server binds quickly
+from scripts.detector_pool import DetectorPool
+from scripts.bulk import (iter_upload_members, detach_upload, save_limited, is_archive, tar_body_upload,
+                          UploadTooLarge, TAR_MIMETYPES)
+from scripts.detection_index import DetectionIndex
+from scripts.quality_controller import QualityController
+from scripts.jobs import JobRegistry
+from scripts.model_fetch import model_files_ok
+from scripts.cluster import WorkerRegistry, Coordinator, add_coordinator_routes
+from scripts.profiling import NULL_PROFILER, make_profiler
 from pathlib import Path
 import shutil
+import threading
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
-app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
@@ -22,6 +34,93 @@ ALLOWED_EXTENSIONS = {
     'video': {'mp4', 'avi', 'mov', 'mkv', 'flv', 'wmv'}
 }
 
+# Upload limits
+MAX_MEMBER_SIZE = 100 * 1024 * 1024  # 100MB per file or archive member
+MAX_JOB_SIZE = 2 * 1024 * 1024 * 1024  # 2GB per request, after extraction
+MAX_JOB_FILES = 5000  # files per bulk request
+app.config['MAX_CONTENT_LENGTH'] = MAX_MEMBER_SIZE
+
+class UploadRequest(Request):
+    """Only bulk uploads may send a request body up to the whole job size"""
+    @property
+    def max_content_length(self):
+        if self.endpoint == 'upload_bulk':
+            return MAX_JOB_SIZE
+        return app.config['MAX_CONTENT_LENGTH']
+
+app.request_class = UploadRequest
+
+# Detection
+DETECTOR_POOL_SIZE = 2
+DETECTOR_PROCESSES = 0  # >0 runs YOLOv4 in this many worker processes, fed through shared memory
+BULK_BATCH_SIZE = 8  # images per batched forward pass
+DETECTOR_MODE = 'yolo'  # 'yolo', or 'cascade' to escalate only hard frames to YOLOv4
+CASCADE_CHEAP_DETECTOR = 'ssd'  # first pass of the cascade: 'ssd' or 'tiny'
+# Accept worker nodes (python -m scripts.worker --coordinator <this app>) and spread
+# videos and bulk images over them while any are alive. Workers must send the
+# shared secret from the CLUSTER_TOKEN environment variable.
+CLUSTER_COORDINATOR = False
+
+# Annotated video output: H.264 through ffmpeg when installed, OpenCV otherwise
+VIDEO_ENCODING = {'encoder': 'auto', 'preset': 'veryfast', 'crf': 23, 'audio': True}
+
+# Decode frames and build the network input in preallocated arrays
+REUSE_FRAME_BUFFERS = True
+
+# Reuse detections for uploaded images whose 256-bit dHash is within this many bits of
+# a recently detected one (None disables). Off by default: a hash cannot tell a few
+# people apart from an empty fixed-camera scene, so a distance above 1 returns wrong
+# counts; 0-1 only catches re-uploads and re-encodes of the same picture.
+DEDUP_MAX_DISTANCE = None
+DEDUP_CACHE_SIZE = 512
+
+# Only store detections while processing; annotated images and videos are drawn from
+# them when first downloaded or previewed, then cached
+DEFERRED_RENDERING = True
+# Seconds clients are asked to wait before polling a video that is being rendered
+RENDER_POLL_SECONDS = 2
+
+# When nothing is drawn while processing, decode oversized JPEGs at 1/2, 1/4 or 1/8 size
+# and shrink large video frames before detection; boxes are stored in source coordinates
+REDUCED_DECODE = True
+
+# Adaptive quality: step down resolution / detection stride when these are exceeded
+FRAME_LATENCY_SLO_MS = 250
+MAX_QUEUE_DEPTH = 4
+
+def create_detector():
+    from scripts.main_yolo import HumanCounter
+    return HumanCounter()
+
+def create_cascade_detector():
+    from scripts.cascade import CascadeCounter
+    return CascadeCounter(CASCADE_CHEAP_DETECTOR)
+
+if DETECTOR_PROCESSES:
+    from scripts.process_pool import ProcessDetectorPool
+    from scripts.main_yolo import HumanCounter
+    detector_pool = ProcessDetectorPool(HumanCounter, size=DETECTOR_PROCESSES, batch_size=BULK_BATCH_SIZE)
+else:
+    detector_pool = DetectorPool(create_detector, size=DETECTOR_POOL_SIZE)
+cascade_pool = DetectorPool(create_cascade_detector, size=DETECTOR_POOL_SIZE)
+quality_controller = QualityController(FRAME_LATENCY_SLO_MS, MAX_QUEUE_DEPTH)
+detection_index = DetectionIndex(os.path.join(PROCESSED_FOLDER, 'detections.db'))
+job_registry = JobRegistry()
+detection_cache = None  # created with cv2 on first use, see get_detection_cache
+renderer = None  # see get_renderer
+cluster_registry = WorkerRegistry()
+coordinator = Coordinator(cluster_registry)
+if CLUSTER_COORDINATOR:
+    add_coordinator_routes(app, cluster_registry)
+
+# Background start-up: imports and model loading, reported by /readyz
+startup = {'imports_seconds': None, 'cold_start_seconds': None, 'models_loaded': 0, 'error': None,
+           'failed_at': None}
+warmup_started = threading.Event()
+warmup_lock = threading.Lock()
+jobs_resumed = threading.Event()  # interrupted jobs are resumed once, after the first warm-up
+WARMUP_RETRY_SECONDS = 10  # a failed warm-up is retried this often, once the model files check out
+
 # Create necessary directories
 for folder in [UPLOAD_FOLDER, PROCESSED_FOLDER, 'models', 'static/results']:
     os.makedirs(folder, exist_ok=True)
@@ -52,11 +151,78 @@ def get_file_type(filename):
     return None
 
 def check_model_files():
-    """Check if YOLO model files exist"""
-    weights_path = "models/yolov4.weights"
-    config_path = "models/yolov4.cfg"
-    names_path = "models/coco.names"
-    return all(os.path.exists(p) for p in [weights_path, config_path, names_path])
+    """Check that the YOLO model files exist and are complete (not placeholders)"""
+    return model_files_ok()
+
+def get_output_filename(filename, file_type):
+    """Name of the processed file for an uploaded file"""
+    output_filename = f"processed_{filename}"
+    if file_type == 'image':
+        return output_filename.rsplit('.', 1)[0] + '.jpg'
+    return output_filename.rsplit('.', 1)[0] + '.mp4'
+
+def build_result(original_filename, file_type, people_count, output_filename, quality_tier=None,
+                 rendered=True, profiler=NULL_PROFILER):
+    """Publish a processed file and describe it for the API response
+
+    Outputs that are not ``rendered`` yet are drawn when the preview or
+    download URL is first requested.
+    """
+    if rendered:
+        # Copy processed file to static folder for web access
+        output_path = os.path.join(PROCESSED_FOLDER, output_filename)
+        static_output_path = os.path.join('static/results', output_filename)
+        with profiler.stage('copy'):
+            shutil.copy2(output_path, static_output_path)
+        processed_url = url_for('static', filename=f'results/{output_filename}')
+    else:
+        processed_url = url_for('preview_file', filename=output_filename)
+    
+    return {
+        'success': True,
+        'file_type': file_type,
+        'people_count': people_count,
+        'original_filename': original_filename,
+        'processed_url': processed_url,
+        'download_url': url_for('download_file', filename=output_filename),
+        'quality_tier': quality_tier
+    }
+
+def get_detector_pool(mode=None):
+    """Pool for the requested detector mode, defaulting to DETECTOR_MODE"""
+    mode = mode or DETECTOR_MODE
+    if mode == 'cascade':
+        return cascade_pool
+    if mode == 'yolo':
+        return detector_pool
+    raise ValueError(f"Unknown detector mode: {mode}")
+
+def get_detection_cache():
+    global detection_cache
+    if detection_cache is None and DEDUP_MAX_DISTANCE is not None:
+        from scripts.dedup import DetectionCache
+        detection_cache = DetectionCache(DEDUP_CACHE_SIZE, DEDUP_MAX_DISTANCE)
+    return detection_cache
+
+def get_renderer():
+    global renderer
+    if renderer is None:
+        from scripts.render import Renderer
+        renderer = Renderer(detection_index, PROCESSED_FOLDER, encoding=VIDEO_ENCODING)
+    return renderer
+
+def use_cluster(pool):
+    """Whether work for ``pool`` should go to cluster workers instead of local detectors"""
+    return CLUSTER_COORDINATOR and pool is detector_pool and coordinator.available()
+
+def parse_time(value):
+    """Parse an epoch timestamp or ISO 8601 string, returning epoch seconds"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
 
 @app.route('/')
 def index():
@@ -69,14 +235,93 @@ def setup():
     """Setup page with instructions"""
     return render_template('setup.html')
 
+def warm_up():
+    """Import the detection stack and load the default detectors in parallel"""
+    try:
+        import scripts.pipeline  # pulls in cv2, numpy and the YOLO detector
+        startup['imports_seconds'] = round(time.time() - STARTED_AT, 3)
+        if not check_model_files():
+            raise Exception("Model files not found. Please complete setup first.")
+        startup['models_loaded'] = get_detector_pool().warm()
+        startup['cold_start_seconds'] = round(time.time() - STARTED_AT, 3)
+        startup['error'] = None
+        print(f"✅ Ready {startup['cold_start_seconds']:.1f}s after start")
+        if not jobs_resumed.is_set():
+            jobs_resumed.set()
+            resume_jobs_in_background()
+    except Exception as e:
+        startup['error'] = str(e)
+        startup['failed_at'] = time.time()
+        print(f"❌ Warm-up failed: {e}")
+        warmup_started.clear()
+
+def start_warmup():
+    """Start warm_up once, without waiting for it.
+
+    After a failure it is started again by a later request, once the model
+    files pass the check (e.g. after setup) and WARMUP_RETRY_SECONDS passed.
+    """
+    with warmup_lock:
+        if warmup_started.is_set():
+            return
+        failed_at = startup['failed_at']
+        if failed_at is not None and (time.time() - failed_at < WARMUP_RETRY_SECONDS
+                                      or not check_model_files()):
+            return
+        warmup_started.set()
+        threading.Thread(target=warm_up, daemon=True).start()
+
+@app.before_request
+def ensure_warmup():
+    # Covers WSGI servers that import the app without running __main__
+    start_warmup()
+
+def startup_status():
+    return {
+        'ready': startup['cold_start_seconds'] is not None,
+        'model_files': check_model_files(),
+        'uptime_seconds': round(time.time() - STARTED_AT, 3),
+        'imports_seconds': startup['imports_seconds'],
+        'cold_start_seconds': startup['cold_start_seconds'],
+        'models_loaded': startup['models_loaded'],
+        'detectors': get_detector_pool().stats(),
+        'cluster_workers': len(cluster_registry.live()) if CLUSTER_COORDINATOR else None,
+        'error': startup['error']
+    }
+
+@app.route('/healthz')
+def healthz():
+    """Liveness: the server is up, whether or not models are loaded"""
+    return jsonify({'status': 'ok', 'uptime_seconds': round(time.time() - STARTED_AT, 3)})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: 200 once the default detectors are loaded, 503 before"""
+    status = startup_status()
+    return jsonify(status), 200 if status['ready'] else 503
+
 @app.route('/api/check-models')
 def check_models():
     """API endpoint to check if model files are ready"""
-    return jsonify({'ready': check_model_files()})
+    status = startup_status()
+    return jsonify({'ready': status['model_files'], 'loaded': status['ready'], 'startup': status})
+
+@app.route('/api/dedup')
+def dedup_status():
+    """Hit rate of the near-duplicate detection cache"""
+    cache = get_detection_cache()
+    return jsonify(cache.stats() if cache else {'enabled': False})
+
+@app.route('/api/quality')
+def quality_status():
+    """Current adaptive quality tier, queue depth and smoothed latency"""
+    return jsonify(quality_controller.stats())
 
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     """Handle file upload and processing"""
+    profiler = NULL_PROFILER
+    background = False
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
@@ -91,107 +336,537 @@ def upload_file():
         if not check_model_files():
             return jsonify({'error': 'Model files not found. Please complete setup first.'}), 400
         
+        # Optionally time each stage of this request: stages, cprofile or stacks
+        profiler = make_profiler(request.form.get('profile'))
+        if profiler.enabled and profiler.mode != 'stages' and request.form.get('progressive') in ('1', 'true', 'on'):
+            raise ValueError("Progressive jobs run in the background and can only be profiled by stages")
+        profiler.start()
+        
         # Save uploaded file
         filename = secure_filename(file.filename)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"{timestamp}_{filename}"
         filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        with profiler.stage('save'):
+            save_limited(file.stream, filepath, MAX_MEMBER_SIZE)
         
         # Determine file type
         file_type = get_file_type(filename)
         
-        # Process the file
-        counter = HumanCounter()
-        
         # Set output path
-        output_filename = f"processed_{filename}"
-        if file_type == 'image':
-            output_filename = output_filename.rsplit('.', 1)[0] + '.jpg'
-        else:
-            output_filename = output_filename.rsplit('.', 1)[0] + '.mp4'
-        
+        output_filename = get_output_filename(filename, file_type)
         output_path = os.path.join(PROCESSED_FOLDER, output_filename)
         
-        # Process the file
-        people_count = process_file_with_counter(counter, filepath, output_path, file_type)
+        pool = get_detector_pool(request.form.get('detector'))
         
-        # Copy processed file to static folder for web access
-        static_output_path = os.path.join('static/results', output_filename)
-        shutil.copy2(output_path, static_output_path)
+        # Optionally keep pre-NMS detections for re-thresholding
+        raw_filename = None
+        raw_path = None
+        if request.form.get('keep_raw') in ('1', 'true', 'on'):
+            if pool is cascade_pool:
+                raise ValueError("Raw detections cannot be kept in cascade mode")
+            raw_filename = output_filename.rsplit('.', 1)[0] + '.raw.npz'
+            raw_path = os.path.join(PROCESSED_FOLDER, raw_filename)
         
-        return jsonify({
-            'success': True,
-            'file_type': file_type,
-            'people_count': people_count,
-            'original_filename': file.filename,
-            'processed_url': url_for('static', filename=f'results/{output_filename}'),
-            'download_url': url_for('download_file', filename=output_filename)
-        })
+        # Index per-frame counts, timed from when the footage was recorded if known
+        original_filename = file.filename
+        recorded_at = parse_time(request.form.get('recorded_at'))
+        writer = detection_index.job_writer(output_filename, original_filename, file_type, recorded_at,
+                                            filepath)
+        
+        # Optionally count video at a fixed sampling rate, returning a time series
+        sample_fps = request.form.get('sample_fps', type=float)
+        count_series = []
+        
+        # Optionally process video in the background, publishing an HLS playlist as it goes
+        playlist_path = None
+        playlist_url = None
+        from scripts.pipeline import process_file_with_counter
+        from scripts.video_io import ffmpeg_available
+        if (request.form.get('progressive') in ('1', 'true', 'on') and file_type == 'video'
+                and not sample_fps and ffmpeg_available()):
+            playlist_name = f"results/{output_filename.rsplit('.', 1)[0]}/index.m3u8"
+            playlist_path = os.path.join('static', playlist_name)
+            playlist_url = url_for('static', filename=playlist_name)
+        
+        def process(job_id=None):
+            try:
+                result = run(job_id)
+            finally:
+                profiler.stop()
+            if profiler.enabled:
+                result['profile'] = profiler.report()
+                result['profile_files'] = [url_for('download_file', filename=os.path.basename(path))
+                                           for path in profiler.save(output_path)]
+            return result
+        
+        def run(job_id=None):
+            def on_frame(frame_index, people_boxes, offset_seconds):
+                writer.add_frame(frame_index, people_boxes, offset_seconds)
+                if sample_fps:
+                    count_series.append({'time': round(offset_seconds, 3), 'frame': frame_index,
+                                         'people_count': len(people_boxes)})
+                if job_id:
+                    job_registry.update(job_id, frames_processed=frame_index + 1)
+            
+            if file_type == 'video' and use_cluster(pool) and not (raw_path or sample_fps or playlist_path):
+                with profiler.stage('detect'):
+                    people_count = coordinator.process_video(filepath, output_path, VIDEO_ENCODING, on_frame)
+                writer.finish(people_count)
+                return build_result(original_filename, file_type, people_count, output_filename,
+                                    profiler=profiler)
+            
+            # Process the file; progressive jobs are watched while they run, so they always render
+            render = not DEFERRED_RENDERING or bool(playlist_path)
+            quality = quality_controller.start_job()
+            cascade_stats = None
+            try:
+                with pool.acquire() as counter:
+                    if pool is cascade_pool:
+                        counter.reset_stats()
+                    people_count = process_file_with_counter(counter, filepath, output_path, file_type,
+                                                             raw_path=raw_path, on_frame=on_frame,
+                                                             quality=quality, encoding=VIDEO_ENCODING,
+                                                             sample_fps=sample_fps,
+                                                             reuse_buffers=REUSE_FRAME_BUFFERS,
+                                                             playlist_path=playlist_path,
+                                                             dedup=get_detection_cache(),
+                                                             render=render, profiler=profiler,
+                                                             reduced_decode=REDUCED_DECODE,
+                                                             on_checkpoint=writer.flush)
+                    if pool is cascade_pool:
+                        cascade_stats = counter.stats()
+            finally:
+                quality.finish()
+            writer.finish(people_count, quality.tier_name)
+            
+            result = build_result(original_filename, file_type, people_count, output_filename,
+                                  quality.tier_name, render, profiler)
+            if raw_filename:
+                result['raw_detections'] = raw_filename
+            if sample_fps and file_type == 'video':
+                result['count_series'] = count_series
+            if cascade_stats:
+                result['cascade'] = cascade_stats
+            if playlist_url:
+                result['playlist_url'] = playlist_url
+            return result
         
+        if playlist_path:
+            background = True
+            job_id = job_registry.submit(copy_current_request_context(process),
+                                         original_filename=original_filename,
+                                         playlist_path=playlist_path, frames_processed=0)
+            return jsonify({
+                'success': True,
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': url_for('job_status', job_id=job_id),
+                'playlist_url': playlist_url
+            }), 202
+        
+        return jsonify(process())
+        
+    except (UploadTooLarge, RequestEntityTooLarge) as e:
+        return jsonify({'error': str(e)}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    finally:
+        if not background:
+            profiler.stop()
 
-def process_file_with_counter(counter, input_path, output_path, file_type):
-    """Process file and return people count"""
-    if not counter.load_model():
-        raise Exception("Failed to load model")
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """Status of a background upload, with its result once it is done"""
+    job = job_registry.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    job['playlist_ready'] = os.path.exists(job.pop('playlist_path'))
+    return jsonify(job)
+
+@app.route('/api/upload/bulk', methods=['POST'])
+def upload_bulk():
+    """Handle several files or zip/tar archives, streaming results as NDJSON"""
+    if request.mimetype in TAR_MIMETYPES:
+        # A raw tar body, with the form fields in the query string
+        files = [tar_body_upload(request.stream)]
+    else:
+        files = request.files.getlist('files') + request.files.getlist('file')
+        files = [f for f in files if f.filename]
+    if not files:
+        return jsonify({'error': 'No file provided'}), 400
     
-    if file_type == 'image':
-        # Process image
-        frame = cv2.imread(input_path)
-        if frame is None:
-            raise Exception("Could not read image file")
+    if not check_model_files():
+        return jsonify({'error': 'Model files not found. Please complete setup first.'}), 400
+    
+    try:
+        pool = get_detector_pool(request.values.get('detector'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    files = [detach_upload(f) for f in files]
+    
+    recorded_at = parse_time(request.values.get('recorded_at'))
+    
+    def generate():
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        summary = {'summary': True, 'processed': 0, 'failed': 0, 'skipped': 0, 'people_count': 0,
+                   'deduplicated': 0}
+        job_bytes = 0
+        job_files = 0
+        pending = []
         
-        people_boxes = counter.detect_people(frame)
-        result_frame, people_count = counter.draw_detections(frame, people_boxes)
+        def flush():
+            for result in process_image_batch(pending, recorded_at, pool):
+                summary['processed' if result.get('success') else 'failed'] += 1
+                summary['people_count'] += result.get('people_count', 0)
+                summary['deduplicated'] += result.get('deduplicated', False)
+                yield json.dumps(result) + '\n'
+            pending.clear()
         
-        cv2.imwrite(output_path, result_frame)
-        return people_count
+        try:
+            for upload in files:
+                for name, stream in iter_upload_members(upload):
+                    if not allowed_file(name) or is_archive(name):
+                        summary['skipped'] += 1
+                        yield json.dumps({'original_filename': name, 'skipped': True,
+                                          'error': 'File type not supported'}) + '\n'
+                        continue
+                    
+                    job_files += 1
+                    if job_files > MAX_JOB_FILES:
+                        raise UploadTooLarge(f"Job exceeds the {MAX_JOB_FILES} file limit")
+                    
+                    filename = f"{timestamp}_{job_files:05d}_{secure_filename(name)}"
+                    filepath = os.path.join(UPLOAD_FOLDER, filename)
+                    limit = min(MAX_MEMBER_SIZE, MAX_JOB_SIZE - job_bytes)
+                    try:
+                        job_bytes += save_limited(stream, filepath, limit)
+                    except UploadTooLarge as e:
+                        if limit < MAX_MEMBER_SIZE:
+                            raise UploadTooLarge("Job exceeds the total size limit")
+                        summary['failed'] += 1
+                        yield json.dumps({'original_filename': name, 'error': str(e)}) + '\n'
+                        continue
+                    
+                    if get_file_type(filename) == 'image':
+                        pending.append((name, filename))
+                        if len(pending) >= BULK_BATCH_SIZE:
+                            yield from flush()
+                    else:
+                        result = process_single_upload(name, filename, recorded_at, pool)
+                        summary['processed' if result.get('success') else 'failed'] += 1
+                        summary['people_count'] += result.get('people_count', 0)
+                        yield json.dumps(result) + '\n'
+            
+            yield from flush()
+        except UploadTooLarge as e:
+            summary['error'] = str(e)
+        except Exception as e:
+            summary['error'] = f"Could not read upload: {e}"
+        finally:
+            for upload in files:
+                upload.close()
         
-    else:  # video
-        # Process video
-        cap = cv2.VideoCapture(input_path)
-        if not cap.isOpened():
-            raise Exception("Could not open video file")
+        yield json.dumps(summary) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def process_single_upload(original_filename, filename, recorded_at=None, pool=None):
+    """Process one saved upload and return its result entry"""
+    from scripts.pipeline import process_file_with_counter
+    pool = pool or detector_pool
+    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    file_type = get_file_type(filename)
+    output_filename = get_output_filename(filename, file_type)
+    output_path = os.path.join(PROCESSED_FOLDER, output_filename)
+    if file_type == 'video' and use_cluster(pool):
+        try:
+            writer = detection_index.job_writer(output_filename, original_filename, file_type, recorded_at,
+                                                filepath)
+            people_count = coordinator.process_video(filepath, output_path, VIDEO_ENCODING,
+                                                     writer.add_frame)
+            writer.finish(people_count)
+            return build_result(original_filename, file_type, people_count, output_filename)
+        except Exception as e:
+            return {'original_filename': original_filename, 'error': str(e)}
+    quality = quality_controller.start_job()
+    try:
+        writer = detection_index.job_writer(output_filename, original_filename, file_type, recorded_at,
+                                            filepath)
+        with pool.acquire() as counter:
+            if pool is cascade_pool:
+                counter.reset_stats()
+            people_count = process_file_with_counter(counter, filepath, output_path, file_type,
+                                                     on_frame=writer.add_frame, quality=quality,
+                                                     encoding=VIDEO_ENCODING,
+                                                     reuse_buffers=REUSE_FRAME_BUFFERS,
+                                                     dedup=get_detection_cache(),
+                                                     render=not DEFERRED_RENDERING,
+                                                     reduced_decode=REDUCED_DECODE,
+                                                     on_checkpoint=writer.flush)
+            cascade_stats = counter.stats() if pool is cascade_pool else None
+        writer.finish(people_count, quality.tier_name)
+        result = build_result(original_filename, file_type, people_count, output_filename,
+                              quality.tier_name, not DEFERRED_RENDERING)
+        if cascade_stats:
+            result['cascade'] = cascade_stats
+        return result
+    except Exception as e:
+        return {'original_filename': original_filename, 'error': str(e)}
+    finally:
+        quality.finish()
+
+def process_image_batch(pending, recorded_at=None, pool=None):
+    """Run a batch of saved images through one pooled detector
+
+    Images that look like a recently detected one, or like an earlier image
+    of the batch, reuse its detections instead of going through inference.
+    """
+    import cv2
+    from scripts.main_yolo import HumanCounterYOLO
+    from scripts.scaled_decode import read_image_scaled, scale_boxes
+    pool = pool or detector_pool
+    if use_cluster(pool):
+        return process_image_batch_on_cluster(pending, recorded_at)
+    results = [None] * len(pending)
+    frames = {}
+    scales = {}
+    for i, (original_filename, filename) in enumerate(pending):
+        path = os.path.join(UPLOAD_FOLDER, filename)
+        if DEFERRED_RENDERING and REDUCED_DECODE:
+            frame, scales[i] = read_image_scaled(path, HumanCounterYOLO.INPUT_SIZE)
+        else:
+            frame = cv2.imread(path)
+        if frame is None:
+            results[i] = {'original_filename': original_filename, 'error': 'Could not read image file'}
+            continue
+        frames[i] = frame
+    
+    if frames:
+        dedup = get_detection_cache()
+        quality = quality_controller.start_job()
+        try:
+            with pool.acquire() as counter:
+                if dedup is not None:
+                    keys, reuse = dedup.lookup_batch(frames, (type(counter).__name__,))
+                else:
+                    keys, reuse = dict.fromkeys(frames), {}
+                batch = list(keys)
+                boxes = {}
+                if batch:
+                    tier = quality.tier()
+                    counter.input_size = tier['input_size']
+                    start = time.perf_counter()
+                    try:
+                        all_boxes = counter.detect_people_batch([frames[i] for i in batch])
+                    finally:
+                        counter.input_size = counter.INPUT_SIZE
+                    latency_ms = (time.perf_counter() - start) * 1000 / len(batch)
+                    for _ in batch:
+                        quality.observe(latency_ms)
+                    for i, people_boxes in zip(batch, all_boxes):
+                        boxes[i] = people_boxes
+                        if dedup is not None:
+                            dedup.store(keys[i], people_boxes)
+                for i, source in reuse.items():
+                    boxes[i] = boxes[source] if isinstance(source, int) else source
+                if scales:
+                    boxes = {i: scale_boxes(people_boxes, scales.get(i)) for i, people_boxes in boxes.items()}
+                if DEFERRED_RENDERING:
+                    drawn = {i: (None, len(boxes[i])) for i in frames}
+                else:
+                    drawn = {i: counter.draw_detections(frame, boxes[i]) for i, frame in frames.items()}
+        except Exception as e:
+            for i in frames:
+                results[i] = {'original_filename': pending[i][0], 'error': str(e)}
+            return results
+        finally:
+            quality.finish()
         
-        # Get video properties
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        for i, (result_frame, people_count) in drawn.items():
+            results[i] = save_image_result(pending[i], result_frame, boxes[i], people_count,
+                                           recorded_at, quality.tier_name)
+            if i in reuse:
+                results[i]['deduplicated'] = True
+    
+    return results
+
+def save_image_result(upload, result_frame, people_boxes, people_count, recorded_at=None,
+                      quality_tier=None):
+    """Write an annotated bulk image (unless rendering is deferred), index its detections and describe it"""
+    import cv2
+    original_filename, filename = upload
+    output_filename = get_output_filename(filename, 'image')
+    if result_frame is not None:
+        cv2.imwrite(os.path.join(PROCESSED_FOLDER, output_filename), result_frame)
+    writer = detection_index.job_writer(output_filename, original_filename, 'image', recorded_at,
+                                        os.path.join(UPLOAD_FOLDER, filename))
+    writer.add_frame(0, people_boxes)
+    writer.finish(people_count, quality_tier)
+    return build_result(original_filename, 'image', people_count, output_filename, quality_tier,
+                        result_frame is not None)
+
+def process_image_batch_on_cluster(pending, recorded_at=None):
+    """Run a batch of saved images on the cluster workers"""
+    jobs = [(os.path.join(UPLOAD_FOLDER, filename),
+             os.path.join(PROCESSED_FOLDER, get_output_filename(filename, 'image')))
+            for _, filename in pending]
+    results = []
+    for (original_filename, filename), outcome in zip(pending, coordinator.process_images(jobs)):
+        if 'error' in outcome:
+            results.append({'original_filename': original_filename, 'error': outcome['error']})
+            continue
+        output_filename = get_output_filename(filename, 'image')
+        writer = detection_index.job_writer(output_filename, original_filename, 'image', recorded_at,
+                                            os.path.join(UPLOAD_FOLDER, filename))
+        writer.add_frame(0, [tuple(b) for b in outcome['boxes']])
+        writer.finish(outcome['people_count'])
+        results.append(build_result(original_filename, 'image', outcome['people_count'], output_filename))
+    return results
+
+@app.route('/api/rethreshold', methods=['POST'])
+def rethreshold_file():
+    """Recount a processed file from its stored raw detections"""
+    from scripts.raw_detections import load_raw_detections, rethreshold, render_overlay
+    try:
+        data = request.get_json(silent=True) or {}
+        raw_filename = secure_filename(data.get('raw_detections', ''))
+        raw_path = os.path.join(PROCESSED_FOLDER, raw_filename)
+        if not raw_filename.endswith('.raw.npz') or not os.path.exists(raw_path):
+            return jsonify({'error': 'Raw detections not found'}), 404
         
-        # Setup video writer
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        confidence_threshold = float(data.get('confidence_threshold', 0.5))
+        nms_threshold = float(data.get('nms_threshold', 0.4))
         
-        max_people_count = 0
-        frame_count = 0
+        raw = load_raw_detections(raw_path)
+        frame_boxes = rethreshold(raw, confidence_threshold, nms_threshold)
+        counts = [len(boxes) for boxes in frame_boxes]
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame_count += 1
-            people_boxes = counter.detect_people(frame)
-            result_frame, people_count = counter.draw_detections(frame, people_boxes)
-            
-            max_people_count = max(max_people_count, people_count)
-            out.write(result_frame)
+        result = {
+            'success': True,
+            'confidence_threshold': confidence_threshold,
+            'nms_threshold': nms_threshold,
+            'people_count': max(counts, default=0),
+            'frame_counts': counts
+        }
         
-        cap.release()
-        out.release()
+        if data.get('render'):
+            base = raw_filename[:-len('.raw.npz')]
+            ext = '.jpg' if raw['fps'] == 0 else '.mp4'
+            output_filename = f"{base}_c{confidence_threshold:.2f}_n{nms_threshold:.2f}{ext}"
+            render_overlay(raw, frame_boxes, os.path.join(PROCESSED_FOLDER, output_filename))
+            file_type = 'image' if ext == '.jpg' else 'video'
+            result.update(build_result(raw_filename, file_type, result['people_count'], output_filename))
         
-        return max_people_count
+        return jsonify(result)
+        
+    except RequestEntityTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-@app.route('/download/<filename>')
-def download_file(filename):
-    """Download processed file"""
+@app.route('/api/index/jobs')
+def index_jobs():
+    """Per-file summaries from the detection index"""
+    limit = request.args.get('limit', 100, type=int)
+    return jsonify({'jobs': detection_index.jobs(limit)})
+
+@app.route('/api/index/jobs/<int:job_id>')
+def index_job(job_id):
+    """Summary and per-frame counts of one indexed job"""
+    job = detection_index.job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    try:
+        start = parse_time(request.args.get('start'))
+        end = parse_time(request.args.get('end'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    job['frames'] = detection_index.frame_counts(job_id, start, end)
+    return jsonify(job)
+
+@app.route('/api/index/counts')
+def index_counts():
+    """Max and mean counts per time bucket across all jobs"""
+    try:
+        start = parse_time(request.args.get('start'))
+        end = parse_time(request.args.get('end'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    bucket = request.args.get('bucket', 60, type=float)
+    job_id = request.args.get('job_id', type=int)
+    return jsonify({'buckets': detection_index.counts_over_time(start, end, bucket, job_id)})
+
+@app.route('/api/index/peaks')
+def index_peaks():
+    """Frames with the highest counts in a time range"""
+    try:
+        start = parse_time(request.args.get('start'))
+        end = parse_time(request.args.get('end'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    limit = request.args.get('limit', 10, type=int)
+    job_id = request.args.get('job_id', type=int)
+    return jsonify({'peaks': detection_index.peaks(start, end, limit, job_id)})
+
+@app.route('/api/index/count-at')
+def index_count_at():
+    """The count at a point in time, from the latest frame at or before it"""
+    try:
+        timestamp = parse_time(request.args.get('time'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if timestamp is None:
+        return jsonify({'error': 'time is required'}), 400
+    frame = detection_index.count_at(timestamp, request.args.get('job_id', type=int))
+    if frame is None:
+        return jsonify({'error': 'No frames indexed before that time'}), 404
+    frame['detections'] = detection_index.detections(frame['job_id'], frame['frame_index'])
+    return jsonify(frame)
+
+def rendered_file(filename):
+    """Status and path of a processed file in the requested style, rendering it on first use
+
+    Images are drawn within the request. Videos are rendered in the
+    background; until they are done the status is 'rendering'.
+    """
+    filename = secure_filename(filename)
+    style = {'show_confidence': request.args.get('show_confidence') in ('1', 'true', 'on')}
     file_path = os.path.join(PROCESSED_FOLDER, filename)
-    if os.path.exists(file_path):
-        return send_file(file_path, as_attachment=True)
+    if os.path.exists(file_path) and not any(style.values()):
+        return 'ready', file_path
+    if get_file_type(filename) == 'image':
+        file_path = get_renderer().render(filename, style)
+        return ('ready', file_path) if file_path else ('missing', None)
+    return get_renderer().start(filename, style)
+
+def send_rendered(filename, **send_options):
+    status, value = rendered_file(filename)
+    if status == 'ready':
+        return send_file(os.path.abspath(value), **send_options)
+    if status == 'rendering':
+        response = jsonify({'status': 'rendering', 'retry_after': RENDER_POLL_SECONDS})
+        response.headers['Retry-After'] = str(RENDER_POLL_SECONDS)
+        return response, 202
+    if status == 'failed':
+        return jsonify({'error': value}), 500
     return "File not found", 404
 
+@app.route('/download/<filename>')
+def download_file(filename):
+    """Download processed file; 202 while a deferred video is still rendering"""
+    return send_rendered(filename, as_attachment=True)
+
+@app.route('/preview/<filename>')
+def preview_file(filename):
+    """Show a processed file inline; 202 while a deferred video is still rendering"""
+    return send_rendered(filename, conditional=True)
+
 @app.route('/api/demo')
 def create_demo():
     """Create demo files for testing"""
@@ -203,5 +878,32 @@ def create_demo():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def resume_jobs_in_background():
+    """Finish video jobs that were interrupted by a restart, each with the detector it started with"""
+    writers = {}
+    
+    def make_on_frame(state):
+        output_filename = os.path.basename(state['output_path'])
+        writers[output_filename] = detection_index.job_writer(output_filename, None, state['file_type'])
+        return writers[output_filename].add_frame
+    
+    def make_on_checkpoint(state):
+        return writers[os.path.basename(state['output_path'])].flush
+    
+    def run():
+        from scripts.pipeline import resume_interrupted_jobs
+        results = resume_interrupted_jobs(None, make_on_frame, make_on_checkpoint)
+        for output_path, people_count in results.items():
+            writers[os.path.basename(output_path)].finish(people_count)
+            if os.path.exists(output_path):
+                static_output_path = os.path.join('static/results', os.path.basename(output_path))
+                shutil.copy2(output_path, static_output_path)
+
+    if check_model_files():
+        threading.Thread(target=run, daemon=True).start()
+
 if __name__ == '__main__':
+    # Only warm up (and resume interrupted jobs) in the serving process, not the reloader parent
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warmup()
     app.run(debug=True, host='0.0.0.0', port=8080)
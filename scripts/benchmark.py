@@ -0,0 +1,347 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import multiprocessing
+import cv2
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from scripts.pipeline import process_file_with_counter
+from scripts.quality_controller import QualityController
+
+BATCH_SIZE = 8
+STRIDE = 2
+SAMPLE_FPS = 5
+PROCESSES = max(2, min(4, os.cpu_count() or 1))
+
+def draw_person(img, x, y, scale, color):
+    """Draw a simple standing figure with its feet at (x, y)"""
+    h = int(120 * scale)
+    w = int(40 * scale)
+    head = max(3, int(12 * scale))
+    # Legs, torso, arms and head
+    cv2.line(img, (x, y - h // 2), (x - w // 3, y), color, max(2, w // 5))
+    cv2.line(img, (x, y - h // 2), (x + w // 3, y), color, max(2, w // 5))
+    cv2.rectangle(img, (x - w // 3, y - h + 2 * head), (x + w // 3, y - h // 2), color, -1)
+    cv2.line(img, (x - w // 3, y - h + 2 * head), (x - w // 2, y - h // 2 - head), color, max(2, w // 6))
+    cv2.line(img, (x + w // 3, y - h + 2 * head), (x + w // 2, y - h // 2 - head), color, max(2, w // 6))
+    cv2.circle(img, (x, y - h + head), head, color, -1)
+
+def make_synthetic_video(path, frames=150, size=(640, 360), people=4, fps=25, seed=0):
+    """Write a deterministic video of figures walking across a textured scene.
+
+    Returns the ground-truth number of fully visible figures per frame.
+    """
+    rng = np.random.RandomState(seed)
+    width, height = size
+    background = rng.randint(60, 120, (height, width, 3)).astype(np.uint8)
+    background = cv2.GaussianBlur(background, (21, 21), 0)
+
+    walkers = []
+    for _ in range(people):
+        walkers.append({
+            'start': rng.randint(-width // 2, width),
+            'speed': rng.choice([-1, 1]) * rng.uniform(2, 6),
+            'y': rng.randint(height // 2, height - 10),
+            'scale': rng.uniform(0.8, 1.4),
+            'color': tuple(int(c) for c in rng.randint(0, 255, 3))
+        })
+
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    truth = []
+    for i in range(frames):
+        frame = background.copy()
+        visible = 0
+        for walker in walkers:
+            x = int(walker['start'] + walker['speed'] * i) % (width + 200) - 100
+            half_width = int(20 * walker['scale'])
+            draw_person(frame, x, walker['y'], walker['scale'], walker['color'])
+            if half_width <= x < width - half_width:
+                visible += 1
+        out.write(frame)
+        truth.append(visible)
+    out.release()
+    return truth
+
+def make_synthetic_image(path, size=(800, 600), people=5, seed=0):
+    """Write a deterministic still with a known number of figures"""
+    rng = np.random.RandomState(seed)
+    width, height = size
+    img = cv2.GaussianBlur(rng.randint(60, 120, (height, width, 3)).astype(np.uint8), (21, 21), 0)
+    for i in range(people):
+        x = int((i + 0.5) * width / people)
+        draw_person(img, x, rng.randint(height // 2, height - 10), rng.uniform(1.0, 1.6),
+                    tuple(int(c) for c in rng.randint(0, 255, 3)))
+    cv2.imwrite(path, img)
+    return [people]
+
+def build_synthetic_fixtures(directory, seed=0):
+    """Generate the default set of synthetic fixtures"""
+    items = []
+    for i, people in enumerate([2, 5]):
+        path = os.path.join(directory, f"synthetic_{i}.mp4")
+        items.append({'path': path, 'file_type': 'video',
+                      'truth': make_synthetic_video(path, people=people, seed=seed + i)})
+    for i, people in enumerate([1, 4, 8]):
+        path = os.path.join(directory, f"synthetic_{i}.jpg")
+        items.append({'path': path, 'file_type': 'image',
+                      'truth': make_synthetic_image(path, people=people, seed=seed + i)})
+    return items
+
+def load_annotated_fixtures(directory):
+    """Load fixtures described by ``annotations.json`` in ``directory``
+
+    The file maps each file name to its people count, or to a list of
+    per-frame counts for videos.
+    """
+    with open(os.path.join(directory, "annotations.json"), "r") as f:
+        annotations = json.load(f)
+
+    items = []
+    for name, truth in sorted(annotations.items()):
+        ext = os.path.splitext(name)[1].lower()
+        file_type = 'video' if ext in ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv'] else 'image'
+        items.append({'path': os.path.join(directory, name), 'file_type': file_type,
+                      'truth': truth if isinstance(truth, list) else [truth]})
+    return items
+
+class FrameLog(dict):
+    """Collects {frame_index: people_count} and arrival times from ``on_frame``"""
+
+    def __init__(self):
+        super().__init__()
+        self.times = []
+
+    def add(self, frame_index, people_boxes, offset_seconds=0.0):
+        self[frame_index] = len(people_boxes)
+        self.times.append(time.perf_counter())
+
+# Processing modes. Each returns {frame_index: people_count} for one fixture.
+
+def run_full(counter, item, work_dir):
+    """Every frame at full quality through the standard pipeline"""
+    counts = FrameLog()
+    output_path = os.path.join(work_dir, "full_" + os.path.basename(item['path']))
+    process_file_with_counter(counter, item['path'], output_path, item['file_type'],
+                              on_frame=counts.add)
+    return counts
+
+def run_stride(counter, item, work_dir):
+    """Detect every STRIDE-th frame and reuse the boxes in between"""
+    tier = {'name': 'stride', 'input_size': getattr(counter, 'input_size', 416), 'stride': STRIDE}
+    quality = QualityController(tiers=[tier]).start_job()
+    counts = FrameLog()
+    output_path = os.path.join(work_dir, "stride_" + os.path.basename(item['path']))
+    process_file_with_counter(counter, item['path'], output_path, item['file_type'],
+                              on_frame=counts.add,
+                              quality=quality)
+    return counts
+
+def run_batched(counter, item, work_dir):
+    """Frames grouped into batches for a single forward pass each"""
+    if item['file_type'] == 'image':
+        frame = cv2.imread(item['path'])
+        return {0: len(counter.detect_people_batch([frame])[0])}
+
+    counts = {}
+    cap = cv2.VideoCapture(item['path'])
+    batch = []
+    index = 0
+    while True:
+        ret, frame = cap.read()
+        if ret:
+            batch.append(frame)
+        if batch and (not ret or len(batch) >= BATCH_SIZE):
+            for boxes in counter.detect_people_batch(batch):
+                counts[index] = len(boxes)
+                index += 1
+            batch = []
+        if not ret:
+            break
+    cap.release()
+    return counts
+
+def run_sampled(counter, item, work_dir):
+    """Decode and detect only SAMPLE_FPS frames per second of video"""
+    counts = FrameLog()
+    output_path = os.path.join(work_dir, "sampled_" + os.path.basename(item['path']))
+    process_file_with_counter(counter, item['path'], output_path, item['file_type'],
+                              on_frame=counts.add,
+                              sample_fps=SAMPLE_FPS)
+    return counts
+
+def run_reuse(counter, item, work_dir):
+    """Every frame at full quality, decoding and preprocessing into reused buffers"""
+    counts = FrameLog()
+    output_path = os.path.join(work_dir, "reuse_" + os.path.basename(item['path']))
+    process_file_with_counter(counter, item['path'], output_path, item['file_type'],
+                              on_frame=counts.add, reuse_buffers=True)
+    return counts
+
+def run_processes(counter, item, work_dir):
+    """Detect every frame in PROCESSES worker processes fed through shared memory"""
+    if item['file_type'] == 'image':
+        return run_full(counter, item, work_dir)
+    counts = FrameLog()
+    output_path = os.path.join(work_dir, "processes_" + os.path.basename(item['path']))
+    process_file_with_counter(counter, item['path'], output_path, item['file_type'],
+                              on_frame=counts.add,
+                              processes=PROCESSES)
+    return counts
+
+MODES = {
+    'full': run_full,
+    'stride': run_stride,
+    'batched': run_batched,
+    'sampled': run_sampled,
+    'processes': run_processes,
+    'reuse': run_reuse,
+}
+
+def make_counter(detector):
+    if detector.startswith('cascade-'):
+        from scripts.cascade import CascadeCounter
+        counter = CascadeCounter(detector.split('-', 1)[1])
+    elif detector == 'ssd':
+        from scripts.main import HumanCounter
+        counter = HumanCounter()
+    else:
+        from scripts.main_yolo import HumanCounter
+        counter = HumanCounter()
+    if not counter.load_model():
+        raise Exception("Failed to load model")
+    return counter
+
+def run_mode(mode, items, detector, trace_alloc=False):
+    """Run one mode over all fixtures and measure error, speed and memory"""
+    counter = make_counter(detector)
+    work_dir = tempfile.mkdtemp(prefix="benchmark_")
+    errors = []
+    intervals = []
+    frames = 0
+    elapsed = 0.0
+    if trace_alloc:
+        tracemalloc.start()
+    try:
+        for item in items:
+            start = time.perf_counter()
+            counts = MODES[mode](counter, item, work_dir)
+            elapsed += time.perf_counter() - start
+            frames += len(counts)
+            for index, count in counts.items():
+                if index < len(item['truth']):
+                    errors.append(abs(count - item['truth'][index]))
+            # Time between consecutive video frames shows latency jitter
+            if item['file_type'] == 'video' and len(getattr(counts, 'times', [])) > 1:
+                intervals.extend(np.diff(counts.times) * 1000)
+        traced_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024) if trace_alloc else None
+    finally:
+        if trace_alloc:
+            tracemalloc.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    peak_mb = None
+    if resource is not None:
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        peak_mb = peak_kb / (1024 * 1024) if sys.platform == 'darwin' else peak_kb / 1024
+
+    return {
+        'mode': mode,
+        'frames': frames,
+        'seconds': elapsed,
+        'fps': frames / elapsed if elapsed else 0.0,
+        'count_mae': float(np.mean(errors)) if errors else None,
+        'count_max_error': int(max(errors)) if errors else None,
+        'peak_memory_mb': peak_mb,
+        'traced_peak_mb': traced_peak,
+        'frame_ms_p50': float(np.percentile(intervals, 50)) if intervals else None,
+        'frame_ms_p99': float(np.percentile(intervals, 99)) if intervals else None,
+        'escalation_rate': counter.stats()['escalation_rate'] if hasattr(counter, 'stats') else None
+    }
+
+def _run_mode_in_child(mode, items, detector, trace_alloc, results):
+    try:
+        results.put(run_mode(mode, items, detector, trace_alloc))
+    except Exception as e:
+        results.put({'mode': mode, 'error': str(e)})
+
+def run_isolated(mode, items, detector, trace_alloc=False):
+    """Run a mode in a fresh process so its peak memory is measured on its own"""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_run_mode_in_child, args=(mode, items, detector, trace_alloc, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+def print_table(results):
+    print(f"\n{'Mode':<12}{'Frames':>8}{'FPS':>9}{'Count MAE':>11}{'Max err':>9}{'Peak MB':>9}"
+          f"{'Traced MB':>11}{'p50 ms':>8}{'p99 ms':>8}{'Escalated':>11}")
+    print("-" * 96)
+    for r in results:
+        if 'error' in r:
+            print(f"{r['mode']:<12}  ❌ {r['error']}")
+            continue
+        mae = f"{r['count_mae']:.3f}" if r['count_mae'] is not None else "-"
+        max_error = r['count_max_error'] if r['count_max_error'] is not None else "-"
+        peak = f"{r['peak_memory_mb']:.0f}" if r['peak_memory_mb'] is not None else "-"
+        traced = f"{r['traced_peak_mb']:.1f}" if r['traced_peak_mb'] is not None else "-"
+        p50 = f"{r['frame_ms_p50']:.1f}" if r['frame_ms_p50'] is not None else "-"
+        p99 = f"{r['frame_ms_p99']:.1f}" if r['frame_ms_p99'] is not None else "-"
+        escalated = f"{r['escalation_rate']:.0%}" if r.get('escalation_rate') is not None else "-"
+        print(f"{r['mode']:<12}{r['frames']:>8}{r['fps']:>9.1f}{mae:>11}{max_error:>9}{peak:>9}"
+              f"{traced:>11}{p50:>8}{p99:>8}{escalated:>11}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Accuracy vs throughput benchmark for all processing modes')
+    parser.add_argument('--fixtures', help='Directory with annotations.json (default: generate synthetic fixtures)')
+    parser.add_argument('--modes', default=','.join(MODES), help='Comma-separated modes to run')
+    parser.add_argument('--detector', choices=['yolo', 'ssd', 'cascade-ssd', 'cascade-tiny'], default='yolo')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for synthetic fixtures')
+    parser.add_argument('--report', help='Write results as JSON to this path')
+    parser.add_argument('--trace-alloc', action='store_true',
+                       help='Measure the traced allocation peak with tracemalloc (slower)')
+
+    args = parser.parse_args()
+    modes = [m.strip() for m in args.modes.split(',') if m.strip()]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        parser.error(f"Unknown modes: {', '.join(unknown)} (available: {', '.join(MODES)})")
+
+    fixture_dir = None
+    if args.fixtures:
+        items = load_annotated_fixtures(args.fixtures)
+    else:
+        fixture_dir = tempfile.mkdtemp(prefix="fixtures_")
+        items = build_synthetic_fixtures(fixture_dir, args.seed)
+
+    try:
+        results = []
+        for mode in modes:
+            print(f"🔄 Running mode: {mode}")
+            results.append(run_isolated(mode, items, args.detector, args.trace_alloc))
+    finally:
+        if fixture_dir:
+            shutil.rmtree(fixture_dir, ignore_errors=True)
+
+    print_table(results)
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({'detector': args.detector, 'fixtures': args.fixtures or 'synthetic',
+                       'results': results}, f, indent=2)
+        print(f"\nReport saved to: {args.report}")
+
+if __name__ == "__main__":
+    main()
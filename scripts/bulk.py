@@ -0,0 +1,85 @@
+import io
+import os
+import tarfile
+import zipfile
+from werkzeug.datastructures import FileStorage
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+# Request bodies that are a whole (optionally compressed) tar archive
+TAR_MIMETYPES = ('application/x-tar', 'application/gzip', 'application/x-gzip',
+                 'application/x-bzip2', 'application/x-xz')
+COPY_CHUNK_SIZE = 1024 * 1024
+
+class UploadTooLarge(Exception):
+    """Raised when an uploaded file or archive member exceeds its size limit"""
+
+def is_archive(filename):
+    """Check if a filename looks like a supported archive"""
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+def detach_upload(file_storage):
+    """Take over an uploaded file so it outlives the request.
+
+    Flask closes ``request.files`` when the view returns, before a streamed
+    response has finished reading them. The returned copy owns the spooled
+    upload and must be closed by the caller.
+    """
+    detached = FileStorage(stream=file_storage.stream, filename=file_storage.filename,
+                           name=file_storage.name, headers=file_storage.headers)
+    file_storage.stream = io.BytesIO()
+    return detached
+
+def tar_body_upload(stream):
+    """Wrap a raw tar request body as an upload.
+
+    The body is read member by member straight from the connection, so it is
+    never spooled to a temporary file the way multipart uploads are.
+    """
+    return FileStorage(stream=stream, filename='upload.tar')
+
+def iter_upload_members(file_storage):
+    """Yield ``(name, stream)`` for every file in an upload.
+
+    Plain files are yielded as-is. Archives are read member by member: tar
+    archives in streaming mode, zip archives through their central directory,
+    so members are decompressed straight from the upload stream without
+    unpacking the whole archive to disk first.
+    """
+    filename = file_storage.filename or ''
+
+    if not is_archive(filename):
+        yield filename, file_storage.stream
+        return
+
+    if filename.lower().endswith('.zip'):
+        with zipfile.ZipFile(file_storage.stream) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                with archive.open(info) as member:
+                    yield os.path.basename(info.filename), member
+    else:
+        with tarfile.open(fileobj=file_storage.stream, mode='r|*') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                stream = archive.extractfile(member)
+                yield os.path.basename(member.name), stream
+
+def save_limited(stream, path, limit):
+    """Copy a stream to ``path``, aborting once more than ``limit`` bytes arrive"""
+    written = 0
+    try:
+        with open(path, 'wb') as f:
+            while True:
+                chunk = stream.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > limit:
+                    raise UploadTooLarge(f"File exceeds the {limit // (1024 * 1024)}MB limit")
+                f.write(chunk)
+    except UploadTooLarge:
+        os.remove(path)
+        raise
+    return written
@@ -0,0 +1,137 @@
+from scripts.main_yolo import HumanCounterYOLO
+
+# Cheap first-pass detectors. YOLOv4-tiny uses the darknet tiny cfg/weights.
+TINY_WEIGHTS_PATH = "models/yolov4-tiny.weights"
+TINY_CONFIG_PATH = "models/yolov4-tiny.cfg"
+
+# Escalate to full YOLOv4 when the cheap pass sees at least this many people
+CROWD_THRESHOLD = 4
+# The cheap pass keeps boxes down to MIN_CONFIDENCE; any box below
+# ACCEPT_CONFIDENCE is too uncertain to trust without escalating
+MIN_CONFIDENCE = 0.25
+ACCEPT_CONFIDENCE = 0.5
+# Escalate when the cheap count differs this much from the tracked count
+DISAGREEMENT = 2
+# Weight of the newest frame in the tracked count
+TRACK_SMOOTHING = 0.3
+
+def make_cheap_detector(name):
+    """Create the first-pass detector: 'ssd' (MobileNet-SSD) or 'tiny' (YOLOv4-tiny)"""
+    if name == 'ssd':
+        from scripts.main import HumanCounter
+        return HumanCounter()
+    if name == 'tiny':
+        return HumanCounterYOLO(TINY_WEIGHTS_PATH, TINY_CONFIG_PATH)
+    raise ValueError(f"Unknown cascade detector: {name}")
+
+class CascadeCounter:
+    """Runs a cheap detector first and only escalates hard frames to YOLOv4.
+
+    A frame is escalated when the cheap pass finds a crowd, reports a box
+    in the uncertain confidence band, or disagrees with the count tracked
+    over the previous frames. Otherwise the cheap boxes are used as is.
+    """
+
+    INPUT_SIZE = HumanCounterYOLO.INPUT_SIZE
+
+    def __init__(self, cheap='ssd', crowd_threshold=CROWD_THRESHOLD,
+                 min_confidence=MIN_CONFIDENCE, accept_confidence=ACCEPT_CONFIDENCE,
+                 disagreement=DISAGREEMENT, smoothing=TRACK_SMOOTHING):
+        self.cheap_name = cheap
+        self.cheap = make_cheap_detector(cheap)
+        self.cheap.confidence_threshold = min_confidence
+        self.full = HumanCounterYOLO()
+        self.crowd_threshold = crowd_threshold
+        self.accept_confidence = accept_confidence
+        self.disagreement = disagreement
+        self.smoothing = smoothing
+        self.tracked_count = None
+        self.reset_stats()
+
+    @property
+    def input_size(self):
+        return self.full.input_size
+
+    @input_size.setter
+    def input_size(self, value):
+        self.full.input_size = value
+
+    @property
+    def profiler(self):
+        return self.full.profiler
+
+    @profiler.setter
+    def profiler(self, profiler):
+        # Only escalated frames show up in the preprocess/forward stages
+        self.full.profiler = profiler
+
+    @property
+    def raw_recorder(self):
+        return None
+
+    @raw_recorder.setter
+    def raw_recorder(self, recorder):
+        if recorder is not None:
+            raise ValueError("Raw detections cannot be kept in cascade mode")
+
+    def load_model(self):
+        return self.cheap.load_model() and self.full.load_model()
+
+    def escalation_reason(self, people_boxes):
+        """Why the cheap result for a frame is not trusted, or None"""
+        count = len(people_boxes)
+        if count >= self.crowd_threshold:
+            return 'crowd'
+        if any(confidence < self.accept_confidence for (_, _, _, _, confidence) in people_boxes):
+            return 'uncertain'
+        if self.tracked_count is not None and abs(count - self.tracked_count) >= self.disagreement:
+            return 'disagreement'
+        return None
+
+    def detect_people(self, frame):
+        """Detect people with the cheap model, escalating to YOLOv4 if needed"""
+        people_boxes = self.cheap.detect_people(frame)
+        reason = self.escalation_reason(people_boxes)
+        if reason:
+            people_boxes = self.full.detect_people(frame)
+            self.escalations[reason] += 1
+        self.frames += 1
+
+        count = len(people_boxes)
+        if self.tracked_count is None:
+            self.tracked_count = float(count)
+        else:
+            self.tracked_count += self.smoothing * (count - self.tracked_count)
+        return people_boxes
+
+    def detect_people_batch(self, frames):
+        """Detect people in independent images, without tracking a count across them"""
+        results = []
+        for frame in frames:
+            self.tracked_count = None
+            results.append(self.detect_people(frame))
+        return results
+
+    def draw_detections(self, frame, people_boxes):
+        return self.full.draw_detections(frame, people_boxes)
+
+    def get_state(self):
+        return {'tracked_count': self.tracked_count}
+
+    def set_state(self, state):
+        self.tracked_count = state.get('tracked_count')
+
+    def reset_stats(self):
+        self.frames = 0
+        self.escalations = {'crowd': 0, 'uncertain': 0, 'disagreement': 0}
+
+    def stats(self):
+        """Escalation counts and rate since the last reset_stats()"""
+        escalated = sum(self.escalations.values())
+        return {
+            'cheap_detector': self.cheap_name,
+            'frames': self.frames,
+            'escalated': escalated,
+            'escalation_rate': escalated / self.frames if self.frames else 0.0,
+            'reasons': dict(self.escalations)
+        }
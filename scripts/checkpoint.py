@@ -0,0 +1,145 @@
+import os
+import json
+import glob
+import shutil
+import subprocess
+import cv2
+from scripts.video_io import OpenCVWriter, ffmpeg_available
+
+CHECKPOINT_ROOT = "processed/checkpoints"
+
+class VideoCheckpoint:
+    """Checkpoint state for a long-running video job.
+
+    The annotated output is written as a series of finished segments. After
+    each segment is closed, the last completed frame index and the running
+    counts are saved to ``checkpoint.json`` so a restarted job can seek past
+    the work that is already on disk.
+    """
+
+    def __init__(self, output_path, root=CHECKPOINT_ROOT):
+        self.output_path = output_path
+        name = os.path.splitext(os.path.basename(output_path))[0]
+        self.directory = os.path.join(root, name)
+        self.state_path = os.path.join(self.directory, "checkpoint.json")
+        self.state = {
+            'input_path': None,
+            'output_path': output_path,
+            'file_type': 'video',
+            'next_frame': 0,
+            'max_people_count': 0,
+            'frame_count': 0,
+            'counter_state': {},
+            'detector': None,  # detectors.detector_spec of the counter the job started with
+            'render': True,  # False for detection-only jobs, which have no segments
+            'segments': []
+        }
+
+    def exists(self):
+        """Check if a checkpoint has been saved for this output"""
+        return os.path.exists(self.state_path)
+
+    def load(self):
+        """Load the saved state, dropping segments that did not survive"""
+        with open(self.state_path, "r") as f:
+            self.state.update(json.load(f))
+        self.state['segments'] = [s for s in self.state['segments']
+                                  if os.path.exists(os.path.join(self.directory, s))]
+        return self.state
+
+    def save(self, **updates):
+        """Atomically write the checkpoint state"""
+        self.state.update(updates)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def next_segment_path(self):
+        """Path for the segment that starts at the current resume point"""
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"segment_{self.state['next_frame']:08d}.mp4"
+        return os.path.join(self.directory, name)
+
+    def add_segment(self, segment_path, **updates):
+        """Record a finished segment together with the state it ends at"""
+        self.state['segments'].append(os.path.basename(segment_path))
+        self.save(**updates)
+
+    def segment_paths(self):
+        return [os.path.join(self.directory, s) for s in self.state['segments']]
+
+    def join_segments(self, audio_source=None):
+        """Concatenate the finished segments into the final output file
+
+        With ffmpeg the segments are joined without re-encoding, the audio
+        track of ``audio_source`` is added and the index is moved to the
+        front for progressive playback.
+        """
+        segments = self.segment_paths()
+        if not segments:
+            raise Exception("No finished segments to join")
+
+        if ffmpeg_available() and _concat_with_ffmpeg(segments, self.output_path, audio_source):
+            return self.output_path
+
+        if len(segments) == 1:
+            shutil.copy2(segments[0], self.output_path)
+            return self.output_path
+
+        _concat_with_opencv(segments, self.output_path)
+        return self.output_path
+
+    def discard(self):
+        """Remove the checkpoint directory once the job has finished"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+def _concat_with_ffmpeg(segments, output_path, audio_source=None):
+    """Join segments without re-encoding using the ffmpeg concat demuxer"""
+    list_path = os.path.join(os.path.dirname(segments[0]), "segments.txt")
+    with open(list_path, "w") as f:
+        for segment in segments:
+            f.write(f"file '{os.path.abspath(segment)}'\n")
+
+    cmd = ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_source:
+        cmd += ["-i", audio_source, "-map", "0:v:0", "-map", "1:a:0?", "-shortest"]
+    cmd += ["-c:v", "copy", "-movflags", "+faststart"]
+
+    if not audio_source:
+        return subprocess.run(cmd + [output_path]).returncode == 0
+
+    # Pass the audio through untouched, or re-encode it if MP4 cannot hold the codec
+    if subprocess.run(cmd + ["-c:a", "copy", output_path]).returncode == 0:
+        return True
+    return subprocess.run(cmd + ["-c:a", "aac", output_path]).returncode == 0
+
+def _concat_with_opencv(segments, output_path):
+    """Join segments by re-writing their frames with OpenCV"""
+    out = None
+    for segment in segments:
+        cap = cv2.VideoCapture(segment)
+        if out is None:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            out = OpenCVWriter(output_path, fps, (width, height))
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            out.write(frame)
+        cap.release()
+    if out is not None:
+        out.release()
+
+def find_checkpoints(root=CHECKPOINT_ROOT):
+    """Return all saved checkpoints that still have an input file"""
+    checkpoints = []
+    for state_path in sorted(glob.glob(os.path.join(root, "*", "checkpoint.json"))):
+        with open(state_path, "r") as f:
+            state = json.load(f)
+        if state.get('input_path') and os.path.exists(state['input_path']):
+            checkpoints.append(state)
+    return checkpoints
@@ -0,0 +1,472 @@
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import shutil
+import secrets
+import argparse
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+CLUSTER_ROOT = "processed/cluster"
+
+# Shared secret workers send when they register and heartbeat
+CLUSTER_TOKEN = os.environ.get("CLUSTER_TOKEN")
+TOKEN_HEADER = "X-Cluster-Token"
+
+# Workers heartbeat this often and count as gone after missing a few
+HEARTBEAT_SECONDS = 5
+WORKER_TIMEOUT = 3 * HEARTBEAT_SECONDS
+
+SEGMENT_SECONDS = 10  # video length per dispatched segment
+IMAGE_CHUNK = 16  # images per dispatched batch
+MAX_ATTEMPTS = 3  # workers tried per segment or batch before the job fails
+TASK_TIMEOUT = 900
+ACQUIRE_TIMEOUT = 300
+
+class WorkerUnavailable(Exception):
+    pass
+
+def encode_multipart(fields, files):
+    """Build a multipart/form-data body from form fields and (field, name, bytes) files"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                     f'{value}\r\n'.encode())
+    for field, filename, data in files:
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+                     f'filename="{filename}"\r\nContent-Type: application/octet-stream\r\n\r\n'.encode())
+        parts.append(data)
+        parts.append(b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+def http_json(url, payload=None, method=None, files=None, timeout=30, token=None):
+    """Send JSON (or a multipart form with ``files``) and decode the JSON answer"""
+    headers = {TOKEN_HEADER: token} if token else {}
+    body = None
+    if files is not None:
+        body, headers['Content-Type'] = encode_multipart({'task': json.dumps(payload or {})}, files)
+    elif payload is not None:
+        body = json.dumps(payload).encode()
+        headers['Content-Type'] = 'application/json'
+    request = urllib.request.Request(url, data=body, headers=headers, method=method)
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read() or b'null')
+
+def download(url, path, timeout=TASK_TIMEOUT, token=None):
+    request = urllib.request.Request(url, headers={TOKEN_HEADER: token} if token else {})
+    with urllib.request.urlopen(request, timeout=timeout) as response, open(path, "wb") as f:
+        shutil.copyfileobj(response, f, 1024 * 1024)
+    return path
+
+def token_matches(value, token):
+    """Constant-time check of a received X-Cluster-Token header"""
+    return hmac.compare_digest((value or '').encode(), token.encode())
+
+def is_retryable(error):
+    """Connection problems and server errors are retried on another worker, bad input is not"""
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code >= 500 or error.code in (408, 429)
+    return isinstance(error, (urllib.error.URLError, OSError, WorkerUnavailable))
+
+class WorkerRegistry:
+    """Worker nodes known to the coordinator, with their load and liveness.
+
+    Workers register their URL and capacity (detectors they keep loaded)
+    and then heartbeat. ``acquire`` hands out the least loaded live worker
+    with a free detector, waiting while all of them are busy.
+    """
+
+    def __init__(self, timeout=WORKER_TIMEOUT):
+        self.timeout = timeout
+        self._workers = {}
+        self._changed = threading.Condition()
+
+    def register(self, url, capacity=1):
+        url = url.rstrip('/')
+        with self._changed:
+            worker = next((w for w in self._workers.values() if w['url'] == url), None)
+            if worker is None:
+                worker = {'id': uuid.uuid4().hex[:12], 'url': url, 'active': 0,
+                          'completed': 0, 'failures': 0, 'registered_at': time.time()}
+                self._workers[worker['id']] = worker
+            worker.update(capacity=max(1, int(capacity)), last_seen=time.time())
+            self._changed.notify_all()
+            return worker['id']
+
+    def heartbeat(self, worker_id, **stats):
+        """Refresh a worker; False tells it to register again"""
+        with self._changed:
+            worker = self._workers.get(worker_id)
+            if worker is None:
+                return False
+            worker.update(last_seen=time.time(), reported=stats)
+            self._changed.notify_all()
+            return True
+
+    def _alive(self, worker):
+        return time.time() - worker['last_seen'] < self.timeout
+
+    def live(self):
+        with self._changed:
+            return [dict(w) for w in self._workers.values() if self._alive(w)]
+
+    def capacity(self):
+        return sum(w['capacity'] for w in self.live())
+
+    def acquire(self, timeout=ACQUIRE_TIMEOUT, exclude=()):
+        """Reserve a detector on the least loaded live worker"""
+        deadline = time.time() + timeout
+        with self._changed:
+            while True:
+                free = [w for w in self._workers.values()
+                        if self._alive(w) and w['active'] < w['capacity'] and w['id'] not in exclude]
+                if not free and exclude:
+                    # Every other worker is gone or busy, allow a retry on the same one
+                    free = [w for w in self._workers.values()
+                            if self._alive(w) and w['active'] < w['capacity']]
+                if free:
+                    worker = min(free, key=lambda w: w['active'] / w['capacity'])
+                    worker['active'] += 1
+                    return dict(worker)
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise WorkerUnavailable("No cluster worker became available")
+                self._changed.wait(min(remaining, HEARTBEAT_SECONDS))
+
+    def release(self, worker_id, ok=True):
+        with self._changed:
+            worker = self._workers.get(worker_id)
+            if worker is None:
+                return
+            worker['active'] -= 1
+            if ok:
+                worker['completed'] += 1
+            else:
+                # Stop sending work until the worker heartbeats again
+                worker['failures'] += 1
+                worker['last_seen'] = 0
+            self._changed.notify_all()
+
+    def stats(self):
+        with self._changed:
+            return [dict(w, alive=self._alive(w)) for w in self._workers.values()]
+
+def split_video(input_path, directory, segment_seconds=SEGMENT_SECONDS):
+    """Cut a video into segment files for dispatch, returns their paths in order
+
+    ffmpeg copies the video stream at keyframes without re-encoding;
+    without it, frames are re-written with OpenCV.
+    """
+    from scripts.video_io import ffmpeg_available, OpenCVWriter
+    os.makedirs(directory, exist_ok=True)
+    pattern = os.path.join(directory, "part_%05d.mp4")
+    if ffmpeg_available():
+        cmd = ["ffmpeg", "-y", "-loglevel", "error", "-i", input_path, "-map", "0:v:0", "-an",
+               "-c", "copy", "-f", "segment", "-segment_time", str(segment_seconds),
+               "-reset_timestamps", "1", pattern]
+        if subprocess.run(cmd).returncode == 0:
+            return sorted(os.path.join(directory, name) for name in os.listdir(directory))
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+
+    import cv2
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise Exception("Could not open video file")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    frames_per_segment = max(1, int(round(fps * segment_seconds)))
+    paths = []
+    out = None
+    written = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if out is None:
+            paths.append(pattern % len(paths))
+            out = OpenCVWriter(paths[-1], fps, size)
+        out.write(frame)
+        written += 1
+        if written % frames_per_segment == 0:
+            out.release()
+            out = None
+    cap.release()
+    if out is not None:
+        out.release()
+    return paths
+
+class Coordinator:
+    """Spreads video segments and image batches over the registered workers
+
+    Every task is retried on another worker when a worker fails or
+    disappears. Results are merged in input order: per-frame callbacks
+    fire in frame order and annotated segments are joined like
+    checkpointed segments.
+    """
+
+    def __init__(self, registry, segment_seconds=SEGMENT_SECONDS, image_chunk=IMAGE_CHUNK,
+                 max_attempts=MAX_ATTEMPTS, token=None):
+        self.registry = registry
+        self.token = token or CLUSTER_TOKEN
+        self.segment_seconds = segment_seconds
+        self.image_chunk = image_chunk
+        self.max_attempts = max_attempts
+
+    def available(self):
+        return bool(self.registry.live())
+
+    def run_task(self, send):
+        """Call ``send(worker_url)`` on a worker, retrying on others if it fails"""
+        tried = []
+        last_error = None
+        for attempt in range(self.max_attempts):
+            worker = self.registry.acquire(exclude=tried)
+            tried.append(worker['id'])
+            try:
+                result = send(worker['url'])
+            except Exception as e:
+                if not is_retryable(e):
+                    # Bad input, the worker itself is fine
+                    self.registry.release(worker['id'])
+                    raise
+                self.registry.release(worker['id'], ok=False)
+                print(f"⚠️ Worker {worker['url']} failed ({e}), retrying")
+                last_error = e
+                continue
+            self.registry.release(worker['id'])
+            return result
+        raise Exception(f"Task failed on {self.max_attempts} workers: {last_error}")
+
+    def _parallelism(self, tasks):
+        return max(1, min(tasks, self.registry.capacity() or 1))
+
+    def process_video(self, input_path, output_path, encoding=None, on_frame=None):
+        """Detect and annotate a video on the workers; returns the max people count"""
+        import cv2
+        from scripts.checkpoint import VideoCheckpoint
+        from scripts.video_io import encoding_options
+
+        cap = cv2.VideoCapture(input_path)
+        if not cap.isOpened():
+            raise Exception("Could not open video file")
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        cap.release()
+
+        encoding = encoding_options(encoding)
+        # Segments carry no audio, the source track is added back when joining
+        task = {'encoding': dict(encoding, audio=False)}
+        checkpoint = VideoCheckpoint(output_path, root=CLUSTER_ROOT)
+        checkpoint.discard()
+        inputs = split_video(input_path, os.path.join(checkpoint.directory, "input"),
+                             self.segment_seconds)
+        if not inputs:
+            raise Exception("Could not read any frames from the video")
+
+        def send_segment(index):
+            segment_path = os.path.join(checkpoint.directory, f"segment_{index:05d}.mp4")
+
+            def send(url):
+                with open(inputs[index], "rb") as f:
+                    data = f.read()
+                result = http_json(f"{url}/tasks/video", task, files=[('segment', os.path.basename(inputs[index]), data)],
+                                   timeout=TASK_TIMEOUT, token=self.token)
+                download(url + result['result_url'], segment_path, token=self.token)
+                _forget_task(url, result['task_id'], self.token)
+                return result
+            return self.run_task(send)
+
+        max_people_count = 0
+        frame_base = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self._parallelism(len(inputs))) as executor:
+                futures = [executor.submit(send_segment, i) for i in range(len(inputs))]
+                try:
+                    for index, future in enumerate(futures):
+                        result = future.result()
+                        if on_frame:
+                            for j, people_boxes in enumerate(result['boxes']):
+                                frame_index = frame_base + j
+                                on_frame(frame_index, [tuple(b) for b in people_boxes],
+                                         frame_index / source_fps)
+                        frame_base += result['frames']
+                        max_people_count = max(max_people_count, result['max_people_count'])
+                        checkpoint.state['segments'].append(f"segment_{index:05d}.mp4")
+                except Exception:
+                    for future in futures:
+                        future.cancel()
+                    raise
+            checkpoint.join_segments(input_path if encoding['audio'] else None)
+        finally:
+            checkpoint.discard()
+        return max_people_count
+
+    def process_images(self, jobs, input_size=None):
+        """Annotate ``(input_path, output_path)`` images on the workers
+
+        Returns one ``{'people_count', 'boxes'}`` or ``{'error'}`` per job, in order.
+        """
+        results = [None] * len(jobs)
+        task = {'input_size': input_size}
+
+        def send_chunk(start):
+            chunk = jobs[start:start + self.image_chunk]
+            files = []
+            for i, (input_path, _) in enumerate(chunk):
+                with open(input_path, "rb") as f:
+                    files.append(('images', f"{i:05d}_{os.path.basename(input_path)}", f.read()))
+
+            def send(url):
+                answer = http_json(f"{url}/tasks/images", task, files=files, timeout=TASK_TIMEOUT,
+                                   token=self.token)
+                chunk_results = []
+                for (_, output_path), result in zip(chunk, answer['results']):
+                    if 'error' not in result:
+                        download(url + result['result_url'], output_path, token=self.token)
+                        result = {'people_count': result['people_count'], 'boxes': result['boxes']}
+                    chunk_results.append(result)
+                _forget_task(url, answer['task_id'], self.token)
+                return chunk_results
+            return self.run_task(send)
+
+        starts = range(0, len(jobs), self.image_chunk)
+        with ThreadPoolExecutor(max_workers=self._parallelism(len(starts))) as executor:
+            for start, future in zip(starts, [executor.submit(send_chunk, s) for s in starts]):
+                try:
+                    chunk_results = future.result()
+                except Exception as e:
+                    chunk_results = [{'error': str(e)}] * len(jobs[start:start + self.image_chunk])
+                results[start:start + len(chunk_results)] = chunk_results
+        return results
+
+def _forget_task(url, task_id, token=None):
+    """Let the worker delete a task's files once the results are fetched"""
+    try:
+        http_json(f"{url}/tasks/{task_id}", method='DELETE', token=token)
+    except Exception:
+        pass  # the worker also cleans up old tasks on its own
+
+def add_coordinator_routes(app, registry, token=None):
+    """Expose worker registration and heartbeats on a Flask app.
+
+    Workers must send ``token`` (default: the CLUSTER_TOKEN environment variable)
+    in the X-Cluster-Token header, so that only they can join the cluster.
+    """
+    from flask import request, jsonify
+
+    token = token or CLUSTER_TOKEN
+    if not token:
+        raise Exception("Set the CLUSTER_TOKEN environment variable to accept cluster workers")
+
+    def authorized():
+        return token_matches(request.headers.get(TOKEN_HEADER), token)
+
+    def register():
+        if not authorized():
+            return jsonify({'error': 'Invalid cluster token'}), 401
+        data = request.get_json(silent=True) or {}
+        if not data.get('url'):
+            return jsonify({'error': 'Worker url is required'}), 400
+        worker_id = registry.register(data['url'], data.get('capacity', 1))
+        print(f"🖥️ Worker registered: {data['url']} ({data.get('capacity', 1)} detectors)")
+        return jsonify({'worker_id': worker_id, 'heartbeat_seconds': HEARTBEAT_SECONDS})
+
+    def heartbeat():
+        if not authorized():
+            return jsonify({'error': 'Invalid cluster token'}), 401
+        data = request.get_json(silent=True) or {}
+        stats = {k: v for k, v in data.items() if k != 'worker_id'}
+        if not registry.heartbeat(data.get('worker_id'), **stats):
+            return jsonify({'error': 'Unknown worker, register again'}), 404
+        return jsonify({'ok': True})
+
+    def workers():
+        if not authorized():
+            return jsonify({'error': 'Invalid cluster token'}), 401
+        return jsonify({'workers': registry.stats(), 'capacity': registry.capacity()})
+
+    app.add_url_rule('/api/cluster/register', 'cluster_register', register, methods=['POST'])
+    app.add_url_rule('/api/cluster/heartbeat', 'cluster_heartbeat', heartbeat, methods=['POST'])
+    app.add_url_rule('/api/cluster/workers', 'cluster_workers', workers)
+
+def start_local_workers(count, coordinator_url, first_port, detector='yolo', capacity=1, token=None):
+    """Start worker nodes as local processes, standing in for separate machines"""
+    processes = []
+    env = dict(os.environ, CLUSTER_TOKEN=token or CLUSTER_TOKEN or '')
+    for i in range(count):
+        cmd = [sys.executable, "-m", "scripts.worker", "--port", str(first_port + i),
+               "--coordinator", coordinator_url, "--detector", detector,
+               "--capacity", str(capacity)]
+        processes.append(subprocess.Popen(cmd, env=env))
+    return processes
+
+def main():
+    parser = argparse.ArgumentParser(description='Process a file on a cluster of worker nodes')
+    parser.add_argument('--input', '-i', required=True, help='Video or image to process')
+    parser.add_argument('--output', '-o', required=True, help='Output file path')
+    parser.add_argument('--port', type=int, default=8090, help='Port workers register on')
+    parser.add_argument('--local-workers', type=int, default=0,
+                       help='Start this many worker processes on this machine')
+    parser.add_argument('--detector', choices=['yolo', 'cascade-ssd', 'cascade-tiny'], default='yolo',
+                       help='Detector for local workers')
+    parser.add_argument('--wait-workers', type=int,
+                       help='Wait until this many workers have registered (default: --local-workers or 1)')
+    parser.add_argument('--segment-seconds', type=float, default=SEGMENT_SECONDS,
+                       help='Video length per dispatched segment')
+
+    args = parser.parse_args()
+    from flask import Flask
+    from werkzeug.serving import make_server
+
+    token = CLUSTER_TOKEN
+    if not token:
+        # Only the local workers started below will know this one
+        token = secrets.token_hex(16)
+        if (args.wait_workers or 0) > args.local_workers:
+            print("⚠️ CLUSTER_TOKEN is not set, remote workers will not be able to register")
+
+    registry = WorkerRegistry()
+    app = Flask(__name__)
+    add_coordinator_routes(app, registry, token)
+    server = make_server('0.0.0.0', args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    processes = start_local_workers(args.local_workers, f"http://127.0.0.1:{args.port}",
+                                    args.port + 1, args.detector, token=token)
+    try:
+        wanted = args.wait_workers or args.local_workers or 1
+        print(f"⏳ Waiting for {wanted} worker(s) on port {args.port}...")
+        while len(registry.live()) < wanted:
+            if processes and all(p.poll() is not None for p in processes):
+                raise SystemExit("❌ Local workers exited before registering")
+            time.sleep(0.5)
+
+        coordinator = Coordinator(registry, segment_seconds=args.segment_seconds, token=token)
+        start = time.time()
+        ext = os.path.splitext(args.input)[1].lower()
+        if ext in ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv']:
+            people_count = coordinator.process_video(args.input, args.output)
+        else:
+            result = coordinator.process_images([(args.input, args.output)])[0]
+            if 'error' in result:
+                raise SystemExit(f"❌ {result['error']}")
+            people_count = result['people_count']
+        print(f"✅ Detected {people_count} people in {time.time() - start:.1f}s "
+              f"on {len(registry.live())} worker(s)")
+        for worker in registry.stats():
+            print(f"   {worker['url']}: {worker['completed']} tasks, {worker['failures']} failures")
+    finally:
+        for process in processes:
+            process.terminate()
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+HASH_SIZE = 16  # 16x16 difference bits, a 256-bit hash
+# Differing bits still treated as the same scene. One small figure walking into a
+# 1080p fixed-camera view changes only ~4 of the 256 bits, so anything above 1
+# starts returning an empty scene's count for frames with people in them.
+MAX_DISTANCE = 1
+CACHE_SIZE = 512
+
+def dhash(frame, hash_size=HASH_SIZE):
+    """Difference hash: brightness gradients of a tiny grayscale copy, as an int"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+class DetectionCache:
+    """Reuses detections for images that look like one seen recently.
+
+    Each detected image is remembered by its dHash. An image whose hash is
+    within ``max_distance`` bits of a remembered one (with the same size and
+    ``context``, e.g. the detector) gets that image's boxes instead of an
+    inference pass. The most recently used ``size`` hashes are kept.
+    """
+
+    def __init__(self, size=CACHE_SIZE, max_distance=MAX_DISTANCE):
+        self.size = size
+        self.max_distance = max_distance
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def _similar(self, a, b):
+        return a[:2] == b[:2] and hamming(a[2], b[2]) <= self.max_distance
+
+    def _find(self, key):
+        if key in self._entries:
+            return key
+        return next((other for other in self._entries if self._similar(other, key)), None)
+
+    def lookup(self, frame, context=()):
+        """Return ``(key, people_boxes)``, with boxes None when nothing similar is cached"""
+        key = (frame.shape, tuple(context), dhash(frame))
+        with self._lock:
+            self.lookups += 1
+            match = self._find(key)
+            if match is None:
+                return key, None
+            self.hits += 1
+            self._entries.move_to_end(match)
+            return key, self._entries[match]
+
+    def lookup_batch(self, frames, context=()):
+        """Sort a batch into frames to detect and frames that can reuse detections
+
+        Returns ``(keys, reuse)``. ``keys`` maps the index of every frame that
+        needs inference to its key for ``store``. ``reuse`` maps every other
+        index to cached boxes, or to the index of an earlier frame in the
+        batch whose detections it should share.
+        """
+        keys = {}
+        reuse = {}
+        for i, frame in frames.items():
+            key, people_boxes = self.lookup(frame, context)
+            if people_boxes is not None:
+                reuse[i] = people_boxes
+                continue
+            leader = next((j for j, other in keys.items() if self._similar(other, key)), None)
+            if leader is None:
+                keys[i] = key
+                continue
+            reuse[i] = leader
+            with self._lock:
+                self.hits += 1
+        return keys, reuse
+
+    def store(self, key, people_boxes):
+        with self._lock:
+            self._entries[key] = list(people_boxes)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def detect(self, frame, detect, context=()):
+        """Cached boxes for ``frame``, or ``detect()``'s result, which is then cached"""
+        key, people_boxes = self.lookup(frame, context)
+        if people_boxes is None:
+            people_boxes = detect()
+            self.store(key, people_boxes)
+        return people_boxes
+
+    def stats(self):
+        with self._lock:
+            return {'lookups': self.lookups, 'hits': self.hits,
+                    'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+                    'entries': len(self._entries), 'max_distance': self.max_distance}
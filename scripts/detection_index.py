@@ -0,0 +1,226 @@
+import os
+import time
+import sqlite3
+from contextlib import contextmanager
+
+INDEX_PATH = "processed/detections.db"
+# Frames buffered before they are written in one transaction
+INSERT_BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    output_filename TEXT UNIQUE NOT NULL,
+    original_filename TEXT,
+    file_type TEXT,
+    started_at REAL NOT NULL,
+    frame_count INTEGER DEFAULT 0,
+    people_count INTEGER DEFAULT 0,
+    quality_tier TEXT,
+    finished INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS frames (
+    job_id INTEGER NOT NULL,
+    frame_index INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    people_count INTEGER NOT NULL,
+    PRIMARY KEY (job_id, frame_index)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS frames_timestamp ON frames (timestamp);
+CREATE INDEX IF NOT EXISTS frames_count ON frames (people_count);
+CREATE TABLE IF NOT EXISTS detections (
+    job_id INTEGER NOT NULL,
+    frame_index INTEGER NOT NULL,
+    x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER,
+    confidence REAL
+);
+CREATE INDEX IF NOT EXISTS detections_frame ON detections (job_id, frame_index);
+"""
+
+class DetectionIndex:
+    """Local SQLite store of per-frame counts and boxes from every job.
+
+    Connections are opened per call so the index can be shared between
+    request threads; the database runs in WAL mode so readers are not
+    blocked while a job is writing.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self.connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            _add_missing_columns(conn, 'jobs', {'quality_tier': 'TEXT', 'source_path': 'TEXT'})
+
+    @contextmanager
+    def connect(self):
+        """Open a connection that commits on success and is always closed"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def job_writer(self, output_filename, original_filename, file_type, started_at=None,
+                   source_path=None):
+        """Start (or restart) indexing a job and return its writer
+
+        ``source_path`` is kept so the annotated output can be rendered later.
+        """
+        started_at = started_at if started_at is not None else time.time()
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (output_filename, original_filename, file_type, started_at, "
+                "source_path) VALUES (?, ?, ?, ?, ?) ON CONFLICT(output_filename) DO UPDATE SET "
+                "original_filename = COALESCE(excluded.original_filename, original_filename), "
+                "file_type = excluded.file_type, "
+                "source_path = COALESCE(excluded.source_path, source_path)",
+                (output_filename, original_filename, file_type, started_at, source_path))
+            row = conn.execute("SELECT id, started_at FROM jobs WHERE output_filename = ?",
+                               (output_filename,)).fetchone()
+        return JobWriter(self, row['id'], row['started_at'])
+
+    def jobs(self, limit=100):
+        """Per-file summaries, newest first"""
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs ORDER BY started_at DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def job(self, job_id):
+        with self.connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def job_by_output(self, output_filename):
+        with self.connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE output_filename = ?",
+                               (output_filename,)).fetchone()
+        return dict(row) if row else None
+
+    def frame_boxes(self, job_id):
+        """Every indexed frame of a job as ``(frame_index, people_boxes)``, in order"""
+        frames = {}
+        with self.connect() as conn:
+            for row in conn.execute("SELECT frame_index FROM frames WHERE job_id = ? "
+                                    "ORDER BY frame_index", (job_id,)):
+                frames[row['frame_index']] = []
+            for row in conn.execute("SELECT frame_index, x1, y1, x2, y2, confidence FROM detections "
+                                    "WHERE job_id = ?", (job_id,)):
+                frames.setdefault(row['frame_index'], []).append(
+                    (row['x1'], row['y1'], row['x2'], row['y2'], row['confidence']))
+        return sorted(frames.items())
+
+    def frame_counts(self, job_id=None, start=None, end=None, limit=10000):
+        """Per-frame counts, optionally for one job and a time range"""
+        where, params = _time_filter(job_id, start, end)
+        with self.connect() as conn:
+            rows = conn.execute(
+                f"SELECT job_id, frame_index, timestamp, people_count FROM frames {where} "
+                "ORDER BY timestamp LIMIT ?", params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def counts_over_time(self, start=None, end=None, bucket_seconds=60, job_id=None):
+        """Max and mean count per time bucket"""
+        where, params = _time_filter(job_id, start, end)
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT CAST(timestamp / ? AS INTEGER) * ? AS bucket, "
+                "MAX(people_count) AS max_count, AVG(people_count) AS mean_count, "
+                f"COUNT(*) AS frames FROM frames {where} GROUP BY bucket ORDER BY bucket",
+                [bucket_seconds, bucket_seconds] + params).fetchall()
+        return [dict(row) for row in rows]
+
+    def peaks(self, start=None, end=None, limit=10, job_id=None):
+        """Frames with the highest counts"""
+        where, params = _time_filter(job_id, start, end)
+        with self.connect() as conn:
+            rows = conn.execute(
+                f"SELECT job_id, frame_index, timestamp, people_count FROM frames {where} "
+                "ORDER BY people_count DESC, timestamp LIMIT ?", params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def count_at(self, timestamp, job_id=None):
+        """The most recent indexed frame at or before ``timestamp``"""
+        where, params = _time_filter(job_id, None, timestamp)
+        with self.connect() as conn:
+            row = conn.execute(
+                f"SELECT job_id, frame_index, timestamp, people_count FROM frames {where} "
+                "ORDER BY timestamp DESC LIMIT 1", params).fetchone()
+        return dict(row) if row else None
+
+    def detections(self, job_id, frame_index):
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT x1, y1, x2, y2, confidence FROM detections "
+                "WHERE job_id = ? AND frame_index = ?", (job_id, frame_index)).fetchall()
+        return [dict(row) for row in rows]
+
+class JobWriter:
+    """Buffers frames of one job and writes them with batched inserts"""
+
+    def __init__(self, index, job_id, started_at):
+        self.index = index
+        self.job_id = job_id
+        self.started_at = started_at
+        self.frames = []
+        self.boxes = []
+
+    def add_frame(self, frame_index, people_boxes, offset_seconds=0.0):
+        """Record one processed frame; ``offset_seconds`` is its position in the source"""
+        self.frames.append((self.job_id, frame_index, self.started_at + offset_seconds,
+                            len(people_boxes)))
+        for (x1, y1, x2, y2, confidence) in people_boxes:
+            self.boxes.append((self.job_id, frame_index, int(x1), int(y1), int(x2), int(y2),
+                               float(confidence)))
+        if len(self.frames) >= INSERT_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.frames:
+            return
+        frame_indexes = [(self.job_id, f[1]) for f in self.frames]
+        with self.index.connect() as conn:
+            # Frames may be re-processed after a resume, replace them
+            conn.executemany("DELETE FROM detections WHERE job_id = ? AND frame_index = ?",
+                             frame_indexes)
+            conn.executemany("INSERT OR REPLACE INTO frames VALUES (?, ?, ?, ?)", self.frames)
+            conn.executemany("INSERT INTO detections VALUES (?, ?, ?, ?, ?, ?, ?)", self.boxes)
+        self.frames = []
+        self.boxes = []
+
+    def finish(self, people_count, quality_tier=None):
+        """Flush remaining frames and store the job summary"""
+        self.flush()
+        with self.index.connect() as conn:
+            frame_count = conn.execute("SELECT COUNT(*) FROM frames WHERE job_id = ?",
+                                       (self.job_id,)).fetchone()[0]
+            conn.execute("UPDATE jobs SET frame_count = ?, people_count = ?, quality_tier = ?, "
+                         "finished = 1 WHERE id = ?",
+                         (frame_count, people_count, quality_tier, self.job_id))
+
+def _add_missing_columns(conn, table, columns):
+    """Bring an index created by an older version up to the current schema"""
+    existing = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, column_type in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+def _time_filter(job_id, start, end):
+    clauses = []
+    params = []
+    if job_id is not None:
+        clauses.append("job_id = ?")
+        params.append(job_id)
+    if start is not None:
+        clauses.append("timestamp >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("timestamp <= ?")
+        params.append(end)
+    where = "WHERE " + " AND ".join(clauses) if clauses else ""
+    return where, params
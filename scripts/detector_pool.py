@@ -0,0 +1,82 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+class DetectorPool:
+    """A fixed-size pool of loaded detectors shared between requests.
+
+    Loading YOLOv4 takes seconds, so detectors are created on demand up to
+    ``size`` and then handed out again instead of being rebuilt per upload.
+    """
+
+    def __init__(self, factory, size=2):
+        self.factory = factory
+        self.size = size
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _create(self):
+        try:
+            counter = self.factory()
+            if not counter.load_model():
+                raise Exception("Failed to load model")
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        return counter
+
+    def _get(self, timeout=None):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            return self._create()
+
+        return self._idle.get(timeout=timeout)
+
+    def warm(self, count=None):
+        """Create and load up to ``count`` detectors in parallel, ahead of the first request
+
+        Returns the number of detectors that are loaded and idle.
+        """
+        count = min(self.size, count or self.size)
+        errors = []
+
+        def load():
+            with self._lock:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            try:
+                self._idle.put(self._create())
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=load) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors and self._idle.qsize() == 0:
+            raise errors[0]
+        return self._idle.qsize()
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        """Borrow a loaded detector for the duration of a ``with`` block"""
+        counter = self._get(timeout)
+        try:
+            yield counter
+        finally:
+            self._idle.put(counter)
+
+    def stats(self):
+        return {'size': self.size, 'created': self._created, 'idle': self._idle.qsize()}
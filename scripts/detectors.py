@@ -0,0 +1,42 @@
+from functools import partial
+
+# Detector names accepted on the command line and stored in checkpoints
+DETECTORS = ('yolo', 'ssd', 'cascade-ssd', 'cascade-tiny')
+
+def create_detector(name='yolo', input_size=None):
+    """Create a detector by name, optionally with a non-default network input size"""
+    if name == 'yolo':
+        from scripts.main_yolo import HumanCounter
+        counter = HumanCounter()
+    elif name == 'ssd':
+        from scripts.main import HumanCounter
+        counter = HumanCounter()
+    elif name.startswith('cascade-'):
+        from scripts.cascade import CascadeCounter
+        counter = CascadeCounter(name.split('-', 1)[1])
+    else:
+        raise ValueError(f"Unknown detector: {name}")
+    if input_size and hasattr(counter, 'input_size'):
+        counter.input_size = input_size
+    return counter
+
+def detector_factory(name='yolo', input_size=None):
+    """Picklable callable creating fresh detectors like create_detector, for pools and processes"""
+    return partial(create_detector, name, input_size)
+
+def detector_spec(counter):
+    """``{'name', 'input_size'}`` that create_detector rebuilds ``counter`` from, or None"""
+    from scripts.cascade import CascadeCounter
+    from scripts.main_yolo import HumanCounterYOLO, HumanCounter, WEIGHTS_PATH
+    from scripts.main import HumanCounter as SSDCounter
+    # Exact types only: a subclass may behave differently from what create_detector builds
+    kind = type(counter)
+    if kind is CascadeCounter:
+        name = f"cascade-{counter.cheap_name}"
+    elif kind in (HumanCounterYOLO, HumanCounter) and counter.weights_path == WEIGHTS_PATH:
+        name = 'yolo'
+    elif kind is SSDCounter:
+        name = 'ssd'
+    else:
+        return None
+    return {'name': name, 'input_size': getattr(counter, 'input_size', None)}
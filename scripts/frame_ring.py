@@ -0,0 +1,74 @@
+import queue
+from multiprocessing import shared_memory
+import numpy as np
+
+# Default slot capacity: one 1080p BGR frame
+DEFAULT_SLOT_BYTES = 1920 * 1080 * 3
+
+class FrameRing:
+    """A fixed ring of preallocated frame slots in shared memory.
+
+    Frames are copied (or decoded) into a free slot once; only the slot
+    index and frame shape travel through queues, and every process maps
+    the slot as a NumPy view without copying. Slot indices are handed out
+    from a shared free queue, so a full ring blocks the producer until a
+    consumer releases a slot.
+
+    The ring can be passed to ``multiprocessing.Process`` arguments; the
+    child attaches to the same memory.
+    """
+
+    def __init__(self, context, slots, slot_bytes=DEFAULT_SLOT_BYTES):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self.free = context.Queue()
+        for slot in range(slots):
+            self.free.put(slot)
+        self.owner = True
+
+    def __getstate__(self):
+        return {'name': self.shm.name, 'slots': self.slots, 'slot_bytes': self.slot_bytes,
+                'free': self.free}
+
+    def __setstate__(self, state):
+        self.slots = state['slots']
+        self.slot_bytes = state['slot_bytes']
+        self.free = state['free']
+        self.shm = shared_memory.SharedMemory(name=state['name'])
+        self.owner = False
+
+    def fits(self, shape, dtype=np.uint8):
+        return int(np.prod(shape)) * np.dtype(dtype).itemsize <= self.slot_bytes
+
+    def acquire(self, timeout=None):
+        """Take a free slot index, waiting while the ring is full"""
+        try:
+            return self.free.get(timeout=timeout)
+        except queue.Empty:
+            raise Exception("Timed out waiting for a free frame slot")
+
+    def release(self, slot):
+        self.free.put(slot)
+
+    def view(self, slot, shape, dtype=np.uint8):
+        """NumPy view of a slot's frame, sharing the slot's memory"""
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def put(self, frame, timeout=None):
+        """Copy a frame into a free slot and return the slot index"""
+        slot = self.acquire(timeout)
+        np.copyto(self.view(slot, frame.shape, frame.dtype), frame)
+        return slot
+
+    def close(self):
+        """Detach from the memory; the creating process also frees it
+
+        Views returned by ``view`` must be dropped first.
+        """
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # a view is still alive, the mapping goes away with it
+        if self.owner:
+            self.shm.unlink()
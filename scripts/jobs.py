@@ -0,0 +1,54 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+# Finished jobs kept for status queries before the oldest are forgotten
+MAX_FINISHED_JOBS = 500
+
+class JobRegistry:
+    """In-memory status of uploads that are processed in the background.
+
+    ``submit`` runs a function in a thread and records whether it is
+    queued, running, done or failed, together with its result or error.
+    The function receives the job id so it can report progress through
+    ``update``.
+    """
+
+    def __init__(self, max_finished=MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, target, **info):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = dict(info, id=job_id, status='queued', created_at=time.time(),
+                                      result=None, error=None)
+            self._forget_finished()
+        threading.Thread(target=self._run, args=(job_id, target), daemon=True).start()
+        return job_id
+
+    def _run(self, job_id, target):
+        self.update(job_id, status='running', started_at=time.time())
+        try:
+            result = target(job_id)
+            self.update(job_id, status='done', result=result, finished_at=time.time())
+        except Exception as e:
+            self.update(job_id, status='failed', error=str(e), finished_at=time.time())
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job['status'] in ('done', 'failed')]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
@@ -0,0 +1,306 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from scripts.cluster import encode_multipart
+
+DEFAULT_URL = "http://localhost:8080"
+REQUEST_TIMEOUT = 600
+
+def build_payloads(payload_dir=None):
+    """Load payload files by type, generating small synthetic ones if no directory is given"""
+    from scripts.benchmark import build_synthetic_fixtures, load_annotated_fixtures
+
+    temp_dir = None
+    if payload_dir and os.path.exists(os.path.join(payload_dir, "annotations.json")):
+        items = load_annotated_fixtures(payload_dir)
+    elif payload_dir:
+        items = []
+        for name in sorted(os.listdir(payload_dir)):
+            ext = os.path.splitext(name)[1].lower()
+            file_type = 'video' if ext in ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv'] else 'image'
+            items.append({'path': os.path.join(payload_dir, name), 'file_type': file_type})
+    else:
+        temp_dir = tempfile.mkdtemp(prefix="load_test_")
+        items = build_synthetic_fixtures(temp_dir)
+
+    payloads = {'image': [], 'video': []}
+    for item in items:
+        with open(item['path'], "rb") as f:
+            payloads[item['file_type']].append((os.path.basename(item['path']), f.read()))
+    if temp_dir:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return payloads
+
+def parse_mix(value):
+    """Parse 'image=0.8,video=0.2' into normalised weights"""
+    mix = {}
+    for part in value.split(','):
+        kind, weight = part.split('=')
+        mix[kind.strip()] = float(weight)
+    total = sum(mix.values())
+    return {kind: weight / total for kind, weight in mix.items()}
+
+def send_request(base_url, endpoint, kind, payload, fields, issued_at=None):
+    """Send one upload and return its latency, status and error
+
+    Latency counts from ``issued_at`` when given, so time spent waiting for
+    a free client is included.
+    """
+    filename, data = payload
+    field = 'files' if endpoint.endswith('/bulk') else 'file'
+    body, content_type = encode_multipart(fields, [(field, filename, data)])
+    request = urllib.request.Request(base_url + endpoint, data=body, method='POST',
+                                     headers={'Content-Type': content_type})
+    start = issued_at or time.perf_counter()
+    status = None
+    error = None
+    try:
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            status = response.status
+            text = response.read().decode()
+        # Bulk uploads stream NDJSON and end with a summary line
+        last = json.loads(text.strip().splitlines()[-1])
+        if last.get('error'):
+            error = last['error']
+        elif last.get('summary') and last.get('failed'):
+            error = f"{last['failed']} files failed"
+    except urllib.error.HTTPError as e:
+        status = e.code
+        text = e.read().decode(errors='replace')
+        try:
+            error = json.loads(text).get('error') or f"HTTP {e.code}"
+        except ValueError:
+            error = f"HTTP {e.code}: {text[:200]}"
+    except Exception as e:
+        error = str(e)
+    return {'kind': kind, 'endpoint': endpoint, 'status': status, 'error': error,
+            'latency': time.perf_counter() - start, 'finished_at': time.time()}
+
+def run_load(base_url, endpoints, payloads, mix, concurrency, total_requests=None,
+             duration=None, rate=None, fields=None, seed=0):
+    """Drive the API and collect one record per request
+
+    Without ``rate`` this is a closed loop of ``concurrency`` clients that
+    send their next request as soon as the last one returns. With ``rate``,
+    requests arrive as a Poisson process at that many per second, with at
+    most ``concurrency`` in flight.
+    """
+    rng = random.Random(seed)
+    kinds = [k for k in mix if payloads.get(k)]
+    if not kinds:
+        raise Exception("No payloads for the requested mix")
+    weights = [mix[k] for k in kinds]
+    lock = threading.Lock()
+    records = []
+    issued = [0]
+    deadline = time.time() + duration if duration else None
+
+    def next_request():
+        with lock:
+            if total_requests is not None and issued[0] >= total_requests:
+                return None
+            if deadline and time.time() >= deadline:
+                return None
+            issued[0] += 1
+            kind = rng.choices(kinds, weights)[0]
+            return kind, rng.choice(payloads[kind]), rng.choice(endpoints)
+
+    def record(result):
+        with lock:
+            records.append(result)
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        if rate:
+            futures = []
+            while True:
+                request = next_request()
+                if request is None:
+                    break
+                kind, payload, endpoint = request
+                futures.append(executor.submit(send_request, base_url, endpoint, kind, payload,
+                                               fields or {}, time.perf_counter()))
+                futures[-1].add_done_callback(lambda f: record(f.result()))
+                time.sleep(rng.expovariate(rate))
+        else:
+            def client():
+                while True:
+                    request = next_request()
+                    if request is None:
+                        return
+                    kind, payload, endpoint = request
+                    record(send_request(base_url, endpoint, kind, payload, fields or {}))
+            for _ in range(concurrency):
+                executor.submit(client)
+    return records, time.time() - start
+
+def summarize(records, elapsed):
+    """Latency percentiles, error rate and throughput, overall and per payload kind"""
+    def stats(subset):
+        latencies = np.array([r['latency'] for r in subset]) * 1000
+        errors = sum(1 for r in subset if r['error'])
+        return {
+            'requests': len(subset),
+            'errors': errors,
+            'error_rate': errors / len(subset) if subset else 0.0,
+            'throughput_rps': len(subset) / elapsed if elapsed else 0.0,
+            'p50_ms': float(np.percentile(latencies, 50)) if len(subset) else None,
+            'p95_ms': float(np.percentile(latencies, 95)) if len(subset) else None,
+            'p99_ms': float(np.percentile(latencies, 99)) if len(subset) else None,
+            'max_ms': float(latencies.max()) if len(subset) else None
+        }
+
+    summary = {'overall': stats(records), 'by_kind': {}}
+    for kind in sorted(set(r['kind'] for r in records)):
+        summary['by_kind'][kind] = stats([r for r in records if r['kind'] == kind])
+    errors = {}
+    for r in records:
+        if r['error']:
+            errors[r['error']] = errors.get(r['error'], 0) + 1
+    summary['top_errors'] = sorted(errors.items(), key=lambda e: -e[1])[:5]
+    return summary
+
+def print_summary(summary, baseline=None):
+    print(f"\n{'Kind':<10}{'Requests':>10}{'Errors':>8}{'RPS':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    print("-" * 66)
+    rows = [('overall', summary['overall'])] + list(summary['by_kind'].items())
+    for kind, s in rows:
+        if not s['requests']:
+            continue
+        print(f"{kind:<10}{s['requests']:>10}{s['error_rate']:>8.1%}{s['throughput_rps']:>8.2f}"
+              f"{s['p50_ms']:>10.0f}{s['p95_ms']:>10.0f}{s['p99_ms']:>10.0f}")
+
+    for error, count in summary['top_errors']:
+        print(f"❌ {count}x {error}")
+
+    if baseline:
+        print("\nCompared to baseline:")
+        old = baseline['summary']['overall']
+        new = summary['overall']
+        for key in ['p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'error_rate']:
+            if old.get(key) is None or new.get(key) is None:
+                continue
+            change = (new[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            print(f"  {key:<16}{old[key]:>10.2f} -> {new[key]:>10.2f}  ({change:+.1f}%)")
+
+def wait_for(url, deadline, process=None):
+    """Poll ``url`` until it answers with 200; returns its JSON body"""
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                return json.loads(response.read().decode())
+        except urllib.error.HTTPError as e:
+            body = json.loads(e.read().decode() or '{}')
+            if body.get('error'):
+                return body
+        except Exception:
+            pass
+        if process is not None and process.poll() is not None:
+            raise Exception("Local app exited during startup")
+        time.sleep(0.05)
+    raise Exception(f"Timed out waiting for {url}")
+
+def start_local_app(port, timeout=300):
+    """Start app.py on ``port``, measuring the time until it binds and until it is ready"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = (f"from app import app, start_warmup; start_warmup(); "
+            f"app.run(host='127.0.0.1', port={port}, threaded=True)")
+    start = time.time()
+    process = subprocess.Popen([sys.executable, "-c", code], cwd=root)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_for(base_url + "/healthz", start + timeout, process)
+        bind_seconds = time.time() - start
+        ready = wait_for(base_url + "/readyz", start + timeout, process)
+        cold_start = {'bind_seconds': bind_seconds, 'ready_seconds': time.time() - start,
+                      'error': ready.get('error')}
+    except Exception:
+        process.terminate()
+        raise
+    print(f"⏱ Bound after {cold_start['bind_seconds']:.2f}s, ready after {cold_start['ready_seconds']:.2f}s")
+    if cold_start['error']:
+        print(f"❌ Not ready: {cold_start['error']}")
+    return process, base_url, cold_start
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the upload API')
+    parser.add_argument('--url', default=DEFAULT_URL, help='Base URL of a running app')
+    parser.add_argument('--start-app', action='store_true', help='Start app.py locally for the run')
+    parser.add_argument('--port', type=int, default=8099, help='Port for --start-app')
+    parser.add_argument('--endpoints', default='/api/upload',
+                       help='Comma-separated upload endpoints, e.g. /api/upload,/api/upload/bulk')
+    parser.add_argument('--payloads', help='Directory of images/videos (default: synthetic)')
+    parser.add_argument('--mix', default='image=0.8,video=0.2', help='Payload mix by type')
+    parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight')
+    parser.add_argument('--rate', type=float, help='Open-loop arrival rate in requests/second')
+    parser.add_argument('--requests', type=int, help='Total requests to send')
+    parser.add_argument('--duration', type=float, help='Stop issuing requests after this many seconds')
+    parser.add_argument('--form', action='append', default=[],
+                       help='Extra form field key=value sent with every upload (repeatable)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report', help='Write the results as JSON to this path')
+    parser.add_argument('--baseline', help='Compare against a previous JSON report')
+
+    args = parser.parse_args()
+    if args.requests is None and args.duration is None:
+        args.requests = 50
+
+    fields = dict(f.split('=', 1) for f in args.form)
+    payloads = build_payloads(args.payloads)
+    endpoints = [e.strip() for e in args.endpoints.split(',') if e.strip()]
+
+    process = None
+    cold_start = None
+    base_url = args.url.rstrip('/')
+    if args.start_app:
+        print("🔄 Starting local app...")
+        process, base_url, cold_start = start_local_app(args.port)
+
+    try:
+        print(f"🔄 Load testing {base_url} with concurrency {args.concurrency}"
+              + (f" at {args.rate}/s" if args.rate else ""))
+        records, elapsed = run_load(base_url, endpoints, payloads, parse_mix(args.mix),
+                                    args.concurrency, args.requests, args.duration,
+                                    args.rate, fields, args.seed)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    summary = summarize(records, elapsed)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    print_summary(summary, baseline)
+
+    if args.report:
+        report = {
+            'url': base_url,
+            'endpoints': endpoints,
+            'mix': args.mix,
+            'concurrency': args.concurrency,
+            'rate': args.rate,
+            'form': fields,
+            'elapsed_seconds': elapsed,
+            'cold_start': cold_start,
+            'summary': summary,
+            'requests': records
+        }
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to: {args.report}")
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,11 @@ import os
 import argparse
 from pathlib import Path
 
+try:
+    from scripts.video_io import open_video_writer, iter_sampled_frames, sampling_step
+except ImportError:  # run as python scripts/main.py
+    from video_io import open_video_writer, iter_sampled_frames, sampling_step
+
 class HumanCounter:
     def __init__(self):
         # Initialize the MobileNet SSD model
@@ -19,6 +24,9 @@ class HumanCounter:
         
     def load_model(self):
         """Load the MobileNet SSD model"""
+        if self.net is not None:
+            return True
+        
         try:
             prototxt_path = "models/MobileNetSSD_deploy.prototxt"
             model_path = "models/MobileNetSSD_deploy.caffemodel"
@@ -124,8 +132,8 @@ class HumanCounter:
             cv2.waitKey(0)
             cv2.destroyAllWindows()
     
-    def process_video(self, input_path, output_path=None, show_result=True):
-        """Process a video file"""
+    def process_video(self, input_path, output_path=None, show_result=True, sample_fps=None):
+        """Process a video file, optionally only every frame at ``sample_fps``"""
         # Open video
         cap = cv2.VideoCapture(input_path)
         if not cap.isOpened():
@@ -135,27 +143,28 @@ class HumanCounter:
         print(f"Processing video: {input_path}")
         
         # Get video properties
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0  # fractional rates like 29.97 keep the audio in sync
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         
-        print(f"Video properties: {width}x{height}, {fps} FPS, {total_frames} frames")
+        print(f"Video properties: {width}x{height}, {int(fps)} FPS, {total_frames} frames")
+        
+        # Skip frames between samples without decoding them
+        step = sampling_step(fps, sample_fps)
+        if step > 1:
+            print(f"Sampling every {step}th frame")
         
         # Setup video writer if output path provided
         out = None
         if output_path:
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            fourcc = cv2.VideoWriter_fourcc(*'XVID')
-            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+            out = open_video_writer(output_path, fps / step, (width, height),
+                                    audio_source=input_path if step == 1 else None)
         
         frame_count = 0
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
+        for frame_index, frame in iter_sampled_frames(cap, step):
             frame_count += 1
             
             # Detect people
@@ -176,7 +185,9 @@ class HumanCounter:
                     break
             
             # Print progress
-            if frame_count % 30 == 0:  # Print every 30 frames
+            if step > 1:
+                print(f"{frame_index / fps:10.2f}s - People: {people_count}")
+            elif frame_count % 30 == 0:  # Print every 30 frames
                 progress = (frame_count / total_frames) * 100
                 print(f"Progress: {progress:.1f}% - Frame {frame_count}/{total_frames} - People: {people_count}")
         
@@ -205,7 +216,7 @@ class HumanCounter:
         else:
             return 'unknown'
     
-    def run(self, input_path, output_path=None, show_result=True):
+    def run(self, input_path, output_path=None, show_result=True, sample_fps=None):
         """Main processing function"""
         # Load model
         if not self.load_model():
@@ -222,7 +233,7 @@ class HumanCounter:
         if input_type == 'image':
             self.process_image(input_path, output_path, show_result)
         elif input_type == 'video':
-            self.process_video(input_path, output_path, show_result)
+            self.process_video(input_path, output_path, show_result, sample_fps)
         else:
             print(f"Error: Unsupported file format. Supported formats:")
             print("Images: .jpg, .jpeg, .png, .bmp, .tiff, .tif")
@@ -236,6 +247,8 @@ def main():
                        help='Output file path (optional)')
     parser.add_argument('--no-display', action='store_true',
                        help='Do not display the result window')
+    parser.add_argument('--sample-fps', type=float,
+                       help='Only process this many video frames per second')
     
     args = parser.parse_args()
     
@@ -249,11 +262,11 @@ def main():
         if input_path.suffix.lower() in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif']:
             args.output = 'output/result.jpg'
         else:
-            args.output = 'output/result.avi'
+            args.output = 'output/result.mp4'
     
     # Initialize and run human counter
     counter = HumanCounter()
-    counter.run(args.input, args.output, not args.no_display)
+    counter.run(args.input, args.output, not args.no_display, args.sample_fps)
 
 if __name__ == "__main__":
     main()
@@ -1,25 +1,48 @@
 import cv2
 import numpy as np
 import os
-import requests
+from scripts.model_fetch import model_files_ok
+from scripts.profiling import NULL_PROFILER
+
+WEIGHTS_PATH = "models/yolov4.weights"
+CONFIG_PATH = "models/yolov4.cfg"
+NAMES_PATH = "models/coco.names"
 
 class HumanCounterYOLO:
-    def __init__(self):
+    INPUT_SIZE = 416
+    
+    def __init__(self, weights_path=WEIGHTS_PATH, config_path=CONFIG_PATH):
+        self.weights_path = weights_path
+        self.config_path = config_path
         self.net = None
         self.output_layers = None
         self.classes = []
         self.confidence_threshold = 0.5
         self.nms_threshold = 0.4
+        self.input_size = self.INPUT_SIZE  # network input, a multiple of 32
+        self.raw_recorder = None  # optional RawDetectionRecorder for pre-NMS candidates
+        self.reuse_buffers = False  # build the input blob in persistent arrays
+        self.profiler = NULL_PROFILER  # a StageProfiler while a profiled job runs
+        self._resized = None
+        self._rgb = None
+        self._blob = None
         
     def load_model(self):
         """Load YOLOv4 model"""
+        if self.net is not None:
+            return True
+        
         try:
-            weights_path = "models/yolov4.weights"
-            config_path = "models/yolov4.cfg"
-            names_path = "models/coco.names"
+            weights_path = self.weights_path
+            config_path = self.config_path
+            names_path = NAMES_PATH
             
-            if not all(os.path.exists(p) for p in [weights_path, config_path, names_path]):
-                print("❌ YOLO model files not found. Downloading...")
+            if weights_path != WEIGHTS_PATH:
+                if not all(os.path.exists(p) for p in [weights_path, config_path, names_path]):
+                    print(f"❌ YOLO model files not found: {weights_path}, {config_path}")
+                    return False
+            elif not model_files_ok():
+                print("❌ YOLO model files missing or incomplete. Downloading...")
                 if not self.download_yolo_files():
                     return False
             
@@ -41,93 +64,93 @@ class HumanCounterYOLO:
     
     def download_yolo_files(self):
         """Download YOLO model files"""
-        print("📥 Downloading YOLO model files...")
-        
-        files = {
-            "models/yolov4.cfg": "https://raw.githubusercontent.com/AlexeyAB/darknet/master/cfg/yolov4.cfg",
-            "models/coco.names": "https://raw.githubusercontent.com/AlexeyAB/darknet/master/data/coco.names",
-            "models/yolov4.weights": "https://github.com/AlexeyAB/darknet/releases/download/darknet_yolo_v3_optimal/yolov4.weights"
-        }
+        from scripts.model_fetch import fetch_all
         
-        os.makedirs("models", exist_ok=True)
-        
-        for filename, url in files.items():
-            if os.path.exists(filename):
-                continue
-                
-            print(f"📥 Downloading {filename}...")
-            try:
-                response = requests.get(url, stream=True)
-                response.raise_for_status()
-                
-                total_size = int(response.headers.get('content-length', 0))
-                downloaded = 0
-                
-                with open(filename, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            downloaded += len(chunk)
-                            
-                            if total_size > 0:
-                                progress = (downloaded / total_size) * 100
-                                print(f"\r  Progress: {progress:.1f}%", end='')
-                
-                print(f"\n✅ Downloaded {filename}")
-                
-            except Exception as e:
-                print(f"\n❌ Error downloading {filename}: {e}")
-                return False
-        
-        return True
+        print("📥 Downloading YOLO model files...")
+        try:
+            return fetch_all()
+        except Exception as e:
+            print(f"\n❌ Error downloading model files: {e}")
+            return False
     
     def detect_people(self, frame):
         """Detect people using YOLO"""
         height, width, channels = frame.shape
+        profiler = self.profiler
         
-        blob = cv2.dnn.blobFromImage(frame, 0.00392, (416, 416), (0, 0, 0), True, crop=False)
-        self.net.setInput(blob)
-        outputs = self.net.forward(self.output_layers)
+        with profiler.stage('preprocess'):
+            if self.reuse_buffers:
+                blob = self.blob_into_buffers(frame)
+            else:
+                size = (self.input_size, self.input_size)
+                blob = cv2.dnn.blobFromImage(frame, 0.00392, size, (0, 0, 0), True, crop=False)
+        with profiler.stage('forward'):
+            self.net.setInput(blob)
+            outputs = self.net.forward(self.output_layers)
         
-        boxes = []
-        confidences = []
-        class_ids = []
+        with profiler.stage('postprocess'):
+            return self.boxes_from_outputs(outputs, width, height)
+    
+    def blob_into_buffers(self, frame):
+        """Same blob as blobFromImage, written into arrays kept between frames"""
+        size = self.input_size
+        if self._blob is None or self._blob.shape[2] != size:
+            self._resized = np.empty((size, size, 3), np.uint8)
+            self._rgb = np.empty((size, size, 3), np.uint8)
+            self._blob = np.empty((1, 3, size, size), np.float32)
+        
+        cv2.resize(frame, (size, size), dst=self._resized)
+        cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        np.multiply(self._rgb.transpose(2, 0, 1), np.float32(0.00392),
+                    out=self._blob[0], casting='unsafe')
+        return self._blob
+    
+    def detect_people_batch(self, frames):
+        """Detect people in several frames with a single forward pass"""
+        if not frames:
+            return []
         
-        for output in outputs:
-            for detection in output:
-                scores = detection[5:]
-                class_id = np.argmax(scores)
-                confidence = scores[class_id]
-                
-                if class_id == 0 and confidence > self.confidence_threshold:
-                    center_x = int(detection[0] * width)
-                    center_y = int(detection[1] * height)
-                    w = int(detection[2] * width)
-                    h = int(detection[3] * height)
-                    
-                    x = int(center_x - w / 2)
-                    y = int(center_y - h / 2)
-                    
-                    boxes.append([x, y, w, h])
-                    confidences.append(float(confidence))
-                    class_ids.append(class_id)
+        profiler = self.profiler
+        with profiler.stage('preprocess'):
+            size = (self.input_size, self.input_size)
+            blob = cv2.dnn.blobFromImages(frames, 0.00392, size, (0, 0, 0), True, crop=False)
+        with profiler.stage('forward'):
+            self.net.setInput(blob)
+            outputs = self.net.forward(self.output_layers)
         
-        indexes = cv2.dnn.NMSBoxes(boxes, confidences, self.confidence_threshold, self.nms_threshold)
+        results = []
+        with profiler.stage('postprocess'):
+            for i, frame in enumerate(frames):
+                height, width = frame.shape[:2]
+                # Batched region layers add a leading batch dimension
+                frame_outputs = [output[i] if output.ndim == 3 else output for output in outputs]
+                results.append(self.boxes_from_outputs(frame_outputs, width, height))
+        return results
+    
+    def boxes_from_outputs(self, outputs, width, height):
+        """Turn raw YOLO outputs for one frame into NMS-filtered person boxes"""
+        recorder = self.raw_recorder
+        min_confidence = self.confidence_threshold
+        if recorder is not None:
+            min_confidence = min(min_confidence, recorder.min_confidence)
         
-        people_boxes = []
-        if len(indexes) > 0:
-            for i in indexes.flatten():
-                x, y, w, h = boxes[i]
-                people_boxes.append((x, y, x + w, y + h, confidences[i]))
+        boxes, confidences = person_candidates(outputs, width, height, min_confidence)
         
-        return people_boxes
+        if recorder is not None:
+            recorder.add(boxes, confidences)
+        
+        return select_people(boxes, confidences, self.confidence_threshold, self.nms_threshold)
     
-    def draw_detections(self, frame, people_boxes):
+    def draw_detections(self, frame, people_boxes, show_confidence=False):
         """Draw bounding boxes and count"""
         people_count = len(people_boxes)
         
         for (x1, y1, x2, y2, confidence) in people_boxes:
             cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
+            if show_confidence:
+                label = f"Person: {confidence:.2f}"
+                cv2.putText(frame, label, (x1, max(y1 - 10, 10)),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
         
         count_text = f"Total no. of people : {people_count}"
         cv2.putText(frame, count_text, (10, frame.shape[0] - 20), 
@@ -135,6 +158,42 @@ class HumanCounterYOLO:
         
         return frame, people_count
 
+def person_candidates(outputs, width, height, min_confidence):
+    """Collect pre-NMS person boxes ``[x, y, w, h]`` and scores from YOLO outputs"""
+    detections = np.vstack(outputs)
+    scores = detections[:, 5:]
+    class_ids = np.argmax(scores, axis=1)
+    confidences = scores[np.arange(len(scores)), class_ids]
+    
+    keep = (class_ids == 0) & (confidences > min_confidence)
+    detections = detections[keep]
+    
+    center_x = (detections[:, 0] * width).astype(np.int32)
+    center_y = (detections[:, 1] * height).astype(np.int32)
+    w = (detections[:, 2] * width).astype(np.int32)
+    h = (detections[:, 3] * height).astype(np.int32)
+    x = np.trunc(center_x - w / 2).astype(np.int32)
+    y = np.trunc(center_y - h / 2).astype(np.int32)
+    
+    boxes = np.stack([x, y, w, h], axis=1)
+    return boxes, confidences[keep].astype(np.float32)
+
+def select_people(boxes, confidences, confidence_threshold, nms_threshold):
+    """Apply the confidence threshold and NMS to candidates from person_candidates"""
+    keep = confidences > confidence_threshold
+    boxes = boxes[keep].tolist()
+    confidences = confidences[keep].tolist()
+    
+    indexes = cv2.dnn.NMSBoxes(boxes, confidences, confidence_threshold, nms_threshold)
+    
+    people_boxes = []
+    if len(indexes) > 0:
+        for i in np.array(indexes).flatten():
+            x, y, w, h = boxes[i]
+            people_boxes.append((x, y, x + w, y + h, confidences[i]))
+    
+    return people_boxes
+
 # For compatibility with existing code
 class HumanCounter(HumanCounterYOLO):
-    pass
\ No newline at end of file
+    pass
@@ -0,0 +1,250 @@
+import os
+import json
+import hashlib
+import argparse
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+MODELS_DIR = "models"
+MANIFEST_PATH = os.path.join(MODELS_DIR, "manifest.json")
+
+# Bytes per range request, and per read/write inside a request
+CHUNK_SIZE = 8 * 1024 * 1024
+BUFFER_SIZE = 1024 * 1024
+DEFAULT_WORKERS = 4
+REQUEST_TIMEOUT = 60
+
+LFS_POINTER_PREFIX = b"version https://git-lfs"
+
+# Detectors warm up in parallel threads; only one of them downloads
+_fetch_lock = threading.Lock()
+
+def load_manifest(path=MANIFEST_PATH):
+    """Files to fetch: name -> {url, sha256, size, min_size}"""
+    with open(path, "r") as f:
+        return json.load(f)['files']
+
+def sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BUFFER_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def check_file(path, entry, full=False):
+    """Return None if ``path`` looks like a good copy of ``entry``, else the reason
+
+    The quick check compares sizes and rejects git-lfs pointer files; with
+    ``full`` the SHA-256 is verified as well.
+    """
+    if not os.path.exists(path):
+        return "missing"
+    size = os.path.getsize(path)
+    if entry.get('size') and size != entry['size']:
+        return f"size {size} does not match {entry['size']}"
+    if size < entry.get('min_size', 1):
+        return f"size {size} is below {entry.get('min_size', 1)}"
+    with open(path, "rb") as f:
+        if f.read(len(LFS_POINTER_PREFIX)) == LFS_POINTER_PREFIX:
+            return "git-lfs pointer, not the file itself"
+    if full and entry.get('sha256') and sha256_of(path) != entry['sha256']:
+        return "SHA-256 does not match the manifest"
+    return None
+
+def model_files_ok(names=None, directory=MODELS_DIR, manifest_path=MANIFEST_PATH):
+    """Quick check that the manifest's model files are present and complete"""
+    files = load_manifest(manifest_path)
+    return all(check_file(os.path.join(directory, name), files[name]) is None
+               for name in (names or files))
+
+def probe(url):
+    """Return (size, supports_ranges, validator) for a URL"""
+    request = urllib.request.Request(url, headers={'Range': 'bytes=0-0'})
+    with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+        validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+        content_range = response.headers.get('Content-Range')
+        if response.status == 206 and content_range and '/' in content_range:
+            total = content_range.rsplit('/', 1)[1]
+            if total != '*':
+                return int(total), True, validator
+        length = response.headers.get('Content-Length')
+        return (int(length) if length else None), False, validator
+
+class Progress:
+    def __init__(self, name, total, done=0):
+        self.name = name
+        self.total = total
+        self.done = done
+        self.lock = threading.Lock()
+
+    def add(self, count):
+        with self.lock:
+            self.done += count
+            if self.total:
+                print(f"\r  {self.name}: {self.done / self.total * 100:5.1f}% "
+                      f"({self.done / 1048576:.1f}/{self.total / 1048576:.1f} MB)", end='')
+
+class RangeDownload:
+    """Parallel, resumable download of one file into ``<dest>.part``
+
+    The file is split into CHUNK_SIZE ranges fetched by a thread pool. The
+    finished chunk numbers are saved in ``<dest>.part.json`` after each
+    chunk, so an interrupted download continues where it stopped as long
+    as the remote file is unchanged.
+    """
+
+    def __init__(self, url, dest, size, validator, workers=DEFAULT_WORKERS, chunk_size=CHUNK_SIZE):
+        self.url = url
+        self.part_path = dest + ".part"
+        self.state_path = dest + ".part.json"
+        self.size = size
+        self.validator = validator
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.lock = threading.Lock()
+        self.state = {'url': url, 'size': size, 'validator': validator,
+                      'chunk_size': chunk_size, 'done': []}
+
+    def _load_state(self):
+        if not (os.path.exists(self.state_path) and os.path.exists(self.part_path)):
+            return False
+        with open(self.state_path, "r") as f:
+            state = json.load(f)
+        same = all(state.get(k) == self.state[k] for k in ('size', 'validator', 'chunk_size'))
+        if same and os.path.getsize(self.part_path) == self.size:
+            self.state = state
+            return True
+        return False
+
+    def _save_state(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _fetch_chunk(self, index, progress):
+        start = index * self.chunk_size
+        end = min(start + self.chunk_size, self.size) - 1
+        request = urllib.request.Request(self.url, headers={'Range': f'bytes={start}-{end}'})
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            if response.status != 206:
+                raise Exception(f"Server ignored the range request ({response.status})")
+            with open(self.part_path, "r+b") as f:
+                f.seek(start)
+                position = start
+                while True:
+                    block = response.read(BUFFER_SIZE)
+                    if not block:
+                        break
+                    f.write(block)
+                    position += len(block)
+                    progress.add(len(block))
+        if position != end + 1:
+            raise Exception(f"Chunk {index} ended after {position - start} of {end - start + 1} bytes")
+        with self.lock:
+            self.state['done'].append(index)
+            self._save_state()
+
+    def run(self, progress_name):
+        chunks = (self.size + self.chunk_size - 1) // self.chunk_size
+        if self._load_state():
+            print(f"🔄 Resuming {progress_name}: {len(self.state['done'])}/{chunks} chunks already done")
+        else:
+            with open(self.part_path, "wb") as f:
+                f.truncate(self.size)
+            self._save_state()
+
+        done = set(self.state['done'])
+        pending = [i for i in range(chunks) if i not in done]
+        already = sum(min(self.chunk_size, self.size - i * self.chunk_size) for i in done)
+        progress = Progress(progress_name, self.size, already)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for future in [executor.submit(self._fetch_chunk, i, progress) for i in pending]:
+                future.result()
+        print()
+        return self.part_path
+
+def stream_download(url, part_path, name):
+    """Single-stream download for servers without range support"""
+    with urllib.request.urlopen(url, timeout=REQUEST_TIMEOUT) as response:
+        length = response.headers.get('Content-Length')
+        progress = Progress(name, int(length) if length else None)
+        with open(part_path, "wb") as f:
+            while True:
+                block = response.read(BUFFER_SIZE)
+                if not block:
+                    break
+                f.write(block)
+                progress.add(len(block))
+    print()
+    return part_path
+
+def fetch_file(name, entry, directory=MODELS_DIR, workers=DEFAULT_WORKERS, url=None):
+    """Download one manifest entry unless a verified copy exists; returns its path"""
+    dest = os.path.join(directory, name)
+    if check_file(dest, entry, full=True) is None:
+        print(f"✅ {name} already present")
+        return dest
+
+    url = url or entry['url']
+    os.makedirs(directory, exist_ok=True)
+    print(f"📥 Downloading {name}...")
+    size, ranges, validator = probe(url)
+
+    if ranges and size:
+        part_path = RangeDownload(url, dest, size, validator, workers).run(name)
+    else:
+        part_path = stream_download(url, dest + ".part", name)
+
+    problem = check_file(part_path, entry, full=True)
+    if problem:
+        os.remove(part_path)
+        if os.path.exists(dest + ".part.json"):
+            os.remove(dest + ".part.json")
+        raise Exception(f"{name} failed verification: {problem}")
+
+    # Only a complete, verified file ever appears under the final name
+    os.replace(part_path, dest)
+    if os.path.exists(dest + ".part.json"):
+        os.remove(dest + ".part.json")
+    print(f"✅ Downloaded and verified {name}")
+    return dest
+
+def fetch_all(directory=MODELS_DIR, manifest_path=MANIFEST_PATH, workers=DEFAULT_WORKERS,
+              base_url=None, names=None):
+    """Fetch every file in the manifest; ``base_url`` replaces the manifest URLs (mirrors, tests)"""
+    files = load_manifest(manifest_path)
+    with _fetch_lock:
+        for name in (names or files):
+            url = f"{base_url.rstrip('/')}/{name}" if base_url else None
+            fetch_file(name, files[name], directory, workers, url)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Download and verify the model files')
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help='Manifest with URLs and checksums')
+    parser.add_argument('--dir', default=MODELS_DIR, help='Directory to download into')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Parallel range requests')
+    parser.add_argument('--base-url', help='Fetch <base-url>/<name> instead of the manifest URLs')
+    parser.add_argument('--verify', action='store_true', help='Only verify the files already present')
+
+    args = parser.parse_args()
+    if args.verify:
+        ok = True
+        for name, entry in load_manifest(args.manifest).items():
+            problem = check_file(os.path.join(args.dir, name), entry, full=True)
+            print(f"❌ {name}: {problem}" if problem else f"✅ {name}")
+            ok = ok and problem is None
+        raise SystemExit(0 if ok else 1)
+
+    try:
+        fetch_all(args.dir, args.manifest, args.workers, args.base_url)
+    except Exception as e:
+        print(f"\n❌ {e}")
+        raise SystemExit(1)
+    print("\n🎉 Model files are ready!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,709 @@
+import os
+import time
+import argparse
+import cv2
+import numpy as np
+from scripts.checkpoint import VideoCheckpoint, find_checkpoints
+from scripts.detectors import create_detector, detector_factory, detector_spec
+from scripts.raw_detections import RawDetectionRecorder
+from scripts.scaled_decode import read_image_scaled, scale_boxes, open_scaled_capture, frame_buffer_for
+from scripts.profiling import NULL_PROFILER, PROFILE_MODES, make_profiler, print_report
+from scripts.video_io import (open_video_writer, encoding_options, OpenCVWriter,
+                              iter_sampled_frames, sampling_step, ffmpeg_available,
+                              HLSWriter, remux_playlist)
+
+# Number of frames written per output segment / checkpoint
+CHECKPOINT_INTERVAL = 300
+
+def process_file_with_counter(counter, input_path, output_path, file_type,
+                              checkpoint_interval=CHECKPOINT_INTERVAL, raw_path=None,
+                              on_frame=None, quality=None, encoding=None, sample_fps=None,
+                              processes=None, reuse_buffers=False, playlist_path=None, dedup=None,
+                              render=True, profiler=None, reduced_decode=False, dedup_frames=False,
+                              on_checkpoint=None, factory=None):
+    """Process file and return people count
+
+    When ``raw_path`` is given, the pre-NMS person candidates of every frame
+    are saved there so the job can be re-thresholded without inference.
+    ``on_frame(frame_index, people_boxes, offset_seconds)`` is called for
+    every processed frame, and ``on_checkpoint()`` before every checkpoint
+    is saved, so a sink buffering ``on_frame`` calls can persist them first
+    and a resumed job leaves no gap. ``quality`` is a JobQuality handle from a
+    QualityController that picks the input size and detection stride.
+    ``encoding`` overrides entries of video_io.DEFAULT_ENCODING. With
+    ``sample_fps``, videos are only decoded and counted at that rate. With
+    ``processes``, every video frame is detected in that many worker
+    processes, each running a detector made by the picklable ``factory``
+    (default: detectors.detector_factory for the counter's detector spec).
+    ``reuse_buffers`` decodes video frames and builds the network input in
+    preallocated arrays instead of allocating new ones for every frame.
+    With ``playlist_path``, videos are written as an HLS playlist that can
+    be watched while the job runs, and remuxed into ``output_path`` at the end.
+    ``dedup`` is a dedup.DetectionCache; images that look like recently
+    detected ones reuse those detections instead of inference. Sampled
+    video frames only use it with ``dedup_frames``, since a fixed camera's
+    frames hash alike whether or not people are in view.
+    With ``render`` False, nothing is drawn or written to ``output_path``;
+    only ``on_frame`` sees the detections, so the annotated output can be
+    rendered later from them (see scripts/render.py). ``profiler`` is a
+    profiling.StageProfiler that records time spent per stage. With
+    ``reduced_decode``, jobs that do not render detect on images and sampled
+    or detection-only video decoded at the smallest power-of-two reduction
+    that still covers the detector input; boxes are mapped back to source
+    coordinates.
+    """
+    if not counter.load_model():
+        raise Exception("Failed to load model")
+
+    if sample_fps and raw_path and file_type == 'video':
+        raise ValueError("Raw detections can only be kept when every frame is processed")
+    if processes and raw_path and file_type == 'video':
+        raise ValueError("Raw detections cannot be kept with process detectors")
+    if playlist_path and file_type == 'video':
+        if sample_fps or processes:
+            raise ValueError("Progressive output needs every frame processed in this process")
+        if not ffmpeg_available():
+            raise ValueError("Progressive output needs ffmpeg")
+    if not render and file_type == 'video' and (processes or playlist_path):
+        raise ValueError("Process detectors and progressive output always render")
+
+    # Start from a clean per-job state; resumed videos restore theirs from the checkpoint
+    if hasattr(counter, 'set_state'):
+        counter.set_state({})
+
+    input_size = getattr(counter, 'input_size', None)
+    if hasattr(counter, 'reuse_buffers'):
+        counter.reuse_buffers = reuse_buffers
+    if raw_path:
+        dedup = None  # cached boxes come without raw candidates
+    frame_dedup = dedup if dedup_frames else None
+    # Rendered frames are drawn at full size, and raw candidates are kept in frame coordinates
+    min_side = None
+    if reduced_decode and not render and not raw_path:
+        min_side = getattr(counter, 'INPUT_SIZE', None)
+    profiler = profiler or NULL_PROFILER
+    if hasattr(counter, 'profiler'):
+        counter.profiler = profiler
+    try:
+        if file_type == 'image':
+            return process_image(counter, input_path, output_path, raw_path, on_frame, quality, dedup,
+                                 render, profiler, min_side)
+        elif sample_fps:
+            return process_video_sampled(counter, input_path, output_path, sample_fps,
+                                         on_frame, quality, encoding, reuse_buffers, frame_dedup, render,
+                                         profiler, min_side)
+        elif processes:
+            return process_video_parallel(counter, input_path, output_path, processes,
+                                          on_frame, encoding, profiler, factory)
+        elif playlist_path:
+            return process_video_progressive(counter, input_path, output_path, playlist_path,
+                                             raw_path, on_frame, quality, encoding, reuse_buffers,
+                                             profiler)
+        elif not render:
+            return detect_video(counter, input_path, output_path, raw_path, on_frame, quality,
+                                reuse_buffers, profiler, min_side, checkpoint_interval, on_checkpoint)
+        else:  # video
+            return process_video_with_checkpoints(counter, input_path, output_path,
+                                                  checkpoint_interval, raw_path, on_frame,
+                                                  quality, encoding, reuse_buffers, profiler,
+                                                  on_checkpoint)
+    finally:
+        counter.raw_recorder = None
+        if hasattr(counter, 'profiler'):
+            counter.profiler = NULL_PROFILER
+        if input_size is not None:
+            counter.input_size = input_size
+
+def process_image(counter, input_path, output_path, raw_path=None, on_frame=None, quality=None,
+                  dedup=None, render=True, profiler=NULL_PROFILER, min_side=None):
+    """Process a single image and return people count"""
+    scale = None
+    with profiler.stage('decode'):
+        if min_side:
+            frame, scale = read_image_scaled(input_path, min_side)
+        else:
+            frame = cv2.imread(input_path)
+    if frame is None:
+        raise Exception("Could not read image file")
+
+    if raw_path:
+        counter.raw_recorder = RawDetectionRecorder()
+        counter.raw_recorder.set_source(input_path, frame.shape[1], frame.shape[0])
+    with profiler.stage('detect'):
+        people_boxes = scale_boxes(detect_deduplicated(counter, frame, quality, {}, dedup), scale)
+    if raw_path:
+        counter.raw_recorder.save(raw_path)
+    if on_frame:
+        on_frame(0, people_boxes, 0.0)
+    if not render:
+        return len(people_boxes)
+    with profiler.stage('draw'):
+        result_frame, people_count = counter.draw_detections(frame, people_boxes)
+
+    with profiler.stage('encode'):
+        cv2.imwrite(output_path, result_frame)
+    return people_count
+
+def detect_at_quality(counter, frame, quality, stride_state):
+    """Detect people at the job's current quality tier
+
+    Frames inside the tier's stride reuse the boxes of the last detected
+    frame. ``stride_state`` carries those boxes between calls.
+    """
+    if quality is None:
+        return counter.detect_people(frame)
+
+    tier = quality.tier()
+    if 'boxes' in stride_state and stride_state['skipped'] + 1 < tier['stride']:
+        stride_state['skipped'] += 1
+        if getattr(counter, 'raw_recorder', None) is not None:
+            counter.raw_recorder.repeat_last()
+        return stride_state['boxes']
+
+    if hasattr(counter, 'input_size'):
+        counter.input_size = tier['input_size']
+    start = time.perf_counter()
+    people_boxes = counter.detect_people(frame)
+    # Latency per output frame, detection cost is spread over the stride
+    quality.observe((time.perf_counter() - start) * 1000 / tier['stride'])
+
+    stride_state['boxes'] = people_boxes
+    stride_state['skipped'] = 0
+    return people_boxes
+
+def detect_deduplicated(counter, frame, quality, stride_state, dedup=None):
+    """detect_at_quality, skipped when ``dedup`` has seen a similar frame"""
+    if dedup is None:
+        return detect_at_quality(counter, frame, quality, stride_state)
+    return dedup.detect(frame, lambda: detect_at_quality(counter, frame, quality, stride_state),
+                        (type(counter).__name__,))
+
+def process_video_with_checkpoints(counter, input_path, output_path,
+                                   checkpoint_interval=CHECKPOINT_INTERVAL, raw_path=None,
+                                   on_frame=None, quality=None, encoding=None, reuse_buffers=False,
+                                   profiler=NULL_PROFILER, on_checkpoint=None):
+    """Process a video in checkpointed segments, resuming a previous run if possible"""
+    checkpoint = _open_checkpoint(output_path, input_path, render=True)
+    state = checkpoint.state
+    raw_path = state.get('raw_path') or raw_path
+
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise Exception("Could not open video file")
+
+    # Get video properties
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+
+    max_people_count = state['max_people_count']
+    frame_count = state['frame_count']
+    next_frame = state['next_frame']
+
+    if next_frame > 0:
+        print(f"🔄 Resuming {input_path} from frame {next_frame}")
+        _seek(cap, next_frame)
+        if state['counter_state'] and hasattr(counter, 'set_state'):
+            counter.set_state(state['counter_state'])
+        if raw_path:
+            counter.raw_recorder = RawDetectionRecorder.load(raw_path)
+            counter.raw_recorder.truncate(next_frame)
+    else:
+        checkpoint.save(input_path=input_path, raw_path=raw_path, detector=detector_spec(counter))
+        if raw_path:
+            counter.raw_recorder = RawDetectionRecorder()
+            counter.raw_recorder.set_source(input_path, width, height, source_fps)
+
+    encoding = encoding_options(encoding)
+    out = None
+    segment_path = None
+    segment_frames = 0
+    stride_state = {}
+    # Every frame is decoded into the same array; writers copy what they keep
+    frame_buffer = np.empty((height, width, 3), np.uint8) if reuse_buffers else None
+
+    while True:
+        with profiler.stage('decode'):
+            ret, frame = cap.read(frame_buffer)
+        if not ret:
+            break
+
+        if out is None:
+            segment_path = checkpoint.next_segment_path()
+            out = open_video_writer(segment_path, source_fps, (width, height), encoding, faststart=False)
+
+        frame_count += 1
+        with profiler.stage('detect'):
+            people_boxes = detect_at_quality(counter, frame, quality, stride_state)
+        if on_frame:
+            frame_index = frame_count - 1
+            on_frame(frame_index, people_boxes, frame_index / source_fps)
+        with profiler.stage('draw'):
+            result_frame, people_count = counter.draw_detections(frame, people_boxes)
+
+        max_people_count = max(max_people_count, people_count)
+        with profiler.stage('encode'):
+            out.write(result_frame)
+        segment_frames += 1
+
+        if segment_frames >= checkpoint_interval:
+            with profiler.stage('encode'):
+                out.release()
+            out = None
+            next_frame += segment_frames
+            segment_frames = 0
+            _save_raw(counter, raw_path)
+            if on_checkpoint:
+                on_checkpoint()
+            checkpoint.add_segment(segment_path, next_frame=next_frame,
+                                   frame_count=frame_count,
+                                   max_people_count=max_people_count,
+                                   counter_state=_counter_state(counter))
+
+    cap.release()
+    if out is not None:
+        with profiler.stage('encode'):
+            out.release()
+        next_frame += segment_frames
+        _save_raw(counter, raw_path)
+        if on_checkpoint:
+            on_checkpoint()
+        checkpoint.add_segment(segment_path, next_frame=next_frame,
+                               frame_count=frame_count,
+                               max_people_count=max_people_count,
+                               counter_state=_counter_state(counter))
+
+    if checkpoint.state['segments']:
+        with profiler.stage('encode'):
+            checkpoint.join_segments(input_path if encoding['audio'] else None)
+    else:
+        OpenCVWriter(output_path, source_fps, (width, height)).release()
+        _save_raw(counter, raw_path)
+    checkpoint.discard()
+
+    return max_people_count
+
+def process_video_sampled(counter, input_path, output_path, sample_fps, on_frame=None,
+                          quality=None, encoding=None, reuse_buffers=False, dedup=None, render=True,
+                          profiler=NULL_PROFILER, min_side=None):
+    """Count people at ``sample_fps`` without decoding the frames in between
+
+    The annotated output contains only the sampled frames, played back at
+    the sampling rate. Sampled jobs are short enough that they are not
+    checkpointed.
+    """
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise Exception("Could not open video file")
+
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    step = sampling_step(source_fps, sample_fps)
+
+    out = open_video_writer(output_path, source_fps / step, (width, height), encoding) if render else None
+    scale = None
+    if min_side and out is None:
+        cap, scale = open_scaled_capture(input_path, cap, min_side, sequential=False)
+    max_people_count = 0
+    stride_state = {}
+    frame_buffer = frame_buffer_for(scale, width, height) if reuse_buffers else None
+
+    sampled = iter_sampled_frames(cap, step, frame_buffer=frame_buffer)
+    try:
+        while True:
+            with profiler.stage('decode'):
+                item = next(sampled, None)
+            if item is None:
+                break
+            frame_index, frame = item
+            with profiler.stage('detect'):
+                people_boxes = scale_boxes(detect_deduplicated(counter, frame, quality, stride_state, dedup),
+                                           scale)
+            if on_frame:
+                on_frame(frame_index, people_boxes, frame_index / source_fps)
+            if out is None:
+                max_people_count = max(max_people_count, len(people_boxes))
+                continue
+            with profiler.stage('draw'):
+                result_frame, people_count = counter.draw_detections(frame, people_boxes)
+
+            max_people_count = max(max_people_count, people_count)
+            with profiler.stage('encode'):
+                out.write(result_frame)
+    finally:
+        cap.release()
+        if out is not None:
+            with profiler.stage('encode'):
+                out.release()
+
+    return max_people_count
+
+def detect_video(counter, input_path, output_path, raw_path=None, on_frame=None, quality=None,
+                 reuse_buffers=False, profiler=NULL_PROFILER, min_side=None,
+                 checkpoint_interval=CHECKPOINT_INTERVAL, on_checkpoint=None):
+    """Detect people in every frame without drawing or encoding an output
+
+    Progress is checkpointed under ``output_path`` every ``checkpoint_interval``
+    frames like a rendered job, only without segments: the resume point,
+    the running count and the counter state. Without an ``output_path``
+    there is nothing to resume into and no checkpoint is kept. With
+    ``min_side``, frames are decoded scaled down towards it.
+    """
+    checkpoint = _open_checkpoint(output_path, input_path, render=False) if output_path else None
+    state = checkpoint.state if checkpoint else {'max_people_count': 0, 'next_frame': 0, 'counter_state': {}}
+    raw_path = state.get('raw_path') or raw_path
+
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise Exception("Could not open video file")
+
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+
+    max_people_count = state['max_people_count']
+    frame_index = state['next_frame']
+    if frame_index > 0:
+        print(f"🔄 Resuming {input_path} from frame {frame_index}")
+        _seek(cap, frame_index)
+        if state['counter_state'] and hasattr(counter, 'set_state'):
+            counter.set_state(state['counter_state'])
+        if raw_path:
+            counter.raw_recorder = RawDetectionRecorder.load(raw_path)
+            counter.raw_recorder.truncate(frame_index)
+    else:
+        if checkpoint:
+            checkpoint.save(input_path=input_path, raw_path=raw_path, render=False,
+                            detector=detector_spec(counter))
+        if raw_path:
+            counter.raw_recorder = RawDetectionRecorder()
+            counter.raw_recorder.set_source(input_path, width, height, source_fps)
+
+    scale = None
+    if min_side and not raw_path:
+        # ffmpeg cannot start at an exact frame, resumed jobs shrink OpenCV's frames instead
+        cap, scale = open_scaled_capture(input_path, cap, min_side, sequential=frame_index == 0)
+    stride_state = {}
+    frame_buffer = frame_buffer_for(scale, width, height) if reuse_buffers else None
+
+    try:
+        while True:
+            with profiler.stage('decode'):
+                ret, frame = cap.read(frame_buffer)
+            if not ret:
+                break
+
+            with profiler.stage('detect'):
+                people_boxes = scale_boxes(detect_at_quality(counter, frame, quality, stride_state), scale)
+            if on_frame:
+                on_frame(frame_index, people_boxes, frame_index / source_fps)
+            max_people_count = max(max_people_count, len(people_boxes))
+            frame_index += 1
+
+            if checkpoint and frame_index % checkpoint_interval == 0:
+                _save_raw(counter, raw_path)
+                if on_checkpoint:
+                    on_checkpoint()
+                checkpoint.save(next_frame=frame_index, frame_count=frame_index,
+                                max_people_count=max_people_count,
+                                counter_state=_counter_state(counter))
+    finally:
+        cap.release()
+
+    _save_raw(counter, raw_path)
+    if checkpoint:
+        checkpoint.discard()
+    return max_people_count
+
+def process_video_progressive(counter, input_path, output_path, playlist_path, raw_path=None,
+                              on_frame=None, quality=None, encoding=None, reuse_buffers=False,
+                              profiler=NULL_PROFILER):
+    """Write the annotated video as HLS segments while it is being processed
+
+    The finished segments are joined into ``output_path`` without
+    re-encoding. Progressive jobs are not checkpointed.
+    """
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise Exception("Could not open video file")
+
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+
+    if raw_path:
+        counter.raw_recorder = RawDetectionRecorder()
+        counter.raw_recorder.set_source(input_path, width, height, source_fps)
+
+    encoding = encoding_options(encoding)
+    out = HLSWriter(playlist_path, source_fps, (width, height), encoding['preset'], encoding['crf'])
+    max_people_count = 0
+    frame_index = 0
+    stride_state = {}
+    frame_buffer = np.empty((height, width, 3), np.uint8) if reuse_buffers else None
+
+    try:
+        while True:
+            with profiler.stage('decode'):
+                ret, frame = cap.read(frame_buffer)
+            if not ret:
+                break
+
+            with profiler.stage('detect'):
+                people_boxes = detect_at_quality(counter, frame, quality, stride_state)
+            if on_frame:
+                on_frame(frame_index, people_boxes, frame_index / source_fps)
+            with profiler.stage('draw'):
+                result_frame, people_count = counter.draw_detections(frame, people_boxes)
+
+            max_people_count = max(max_people_count, people_count)
+            with profiler.stage('encode'):
+                out.write(result_frame)
+            frame_index += 1
+    finally:
+        cap.release()
+        with profiler.stage('encode'):
+            out.release()
+
+    _save_raw(counter, raw_path)
+    with profiler.stage('encode'):
+        remux_playlist(playlist_path, output_path, input_path if encoding['audio'] else None)
+    return max_people_count
+
+def process_video_parallel(counter, input_path, output_path, processes, on_frame=None,
+                           encoding=None, profiler=NULL_PROFILER, factory=None):
+    """Detect video frames in worker processes and write them back in order
+
+    Frames are decoded straight into a shared-memory FrameRing; workers map
+    them in place and only slot indices and boxes cross process boundaries.
+    This path trades checkpointing and adaptive quality for throughput on
+    multi-core machines.
+    """
+    from scripts.process_pool import DetectorProcesses
+
+    if factory is None:
+        spec = detector_spec(counter)
+        if spec is None:
+            raise ValueError(f"Pass a detector factory to run {type(counter).__name__} in processes")
+        factory = detector_factory(spec['name'], spec['input_size'])
+
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise Exception("Could not open video file")
+
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    shape = (height, width, 3)
+
+    encoding = encoding_options(encoding)
+    detectors = DetectorProcesses(factory, processes, slots=processes * 2 + 2,
+                                  slot_bytes=height * width * 3)
+    ring = detectors.ring
+    out = open_video_writer(output_path, source_fps, (width, height), encoding,
+                            audio_source=input_path if encoding['audio'] else None)
+
+    slots = {}
+    finished = {}
+    next_read = 0
+    next_write = 0
+    end_of_video = False
+    max_people_count = 0
+
+    try:
+        while True:
+            # Keep every slot busy: decode ahead while the workers detect
+            while not end_of_video and next_read - next_write < ring.slots:
+                slot = ring.acquire()
+                frame = ring.view(slot, shape)
+                with profiler.stage('decode'):
+                    ret, decoded = cap.read(frame)
+                    if ret and decoded.ctypes.data != frame.ctypes.data:
+                        np.copyto(frame, decoded)
+                if not ret:
+                    ring.release(slot)
+                    end_of_video = True
+                    break
+                slots[next_read] = slot
+                detectors.submit_slot(next_read, slot, shape)
+                next_read += 1
+
+            if next_write == next_read:
+                break
+
+            with profiler.stage('detect'):  # waiting on the worker processes
+                frame_index, all_boxes = detectors.result()
+            finished[frame_index] = all_boxes[0]
+
+            while next_write in finished:
+                people_boxes = finished.pop(next_write)
+                slot = slots.pop(next_write)
+                if on_frame:
+                    on_frame(next_write, people_boxes, next_write / source_fps)
+                with profiler.stage('draw'):
+                    result_frame, people_count = counter.draw_detections(ring.view(slot, shape),
+                                                                         people_boxes)
+                max_people_count = max(max_people_count, people_count)
+                with profiler.stage('encode'):
+                    out.write(result_frame)
+                del result_frame
+                ring.release(slot)
+                next_write += 1
+    finally:
+        cap.release()
+        with profiler.stage('encode'):
+            out.release()
+        frame = decoded = None
+        detectors.close()
+
+    return max_people_count
+
+def _open_checkpoint(output_path, input_path, render=True):
+    """Checkpoint to continue for ``output_path``, or a fresh one if the saved one does not fit"""
+    checkpoint = VideoCheckpoint(output_path)
+    if checkpoint.exists():
+        state = checkpoint.load()
+        raw_lost = state.get('raw_path') and not os.path.exists(state['raw_path'])
+        if state['input_path'] != input_path or raw_lost or state['render'] != render:
+            checkpoint.discard()
+            checkpoint = VideoCheckpoint(output_path)
+    return checkpoint
+
+def _seek(cap, frame_index):
+    """Move a capture to ``frame_index``, grabbing frames when the container cannot seek"""
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != frame_index:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        for _ in range(frame_index):
+            if not cap.grab():
+                break
+
+def _save_raw(counter, raw_path):
+    """Flush recorded raw candidates so they stay in step with the checkpoint"""
+    if raw_path and counter.raw_recorder is not None:
+        counter.raw_recorder.save(raw_path)
+
+def _counter_state(counter):
+    """Snapshot any state the counter carries between frames"""
+    if hasattr(counter, 'get_state'):
+        return counter.get_state()
+    return {}
+
+def resume_interrupted_jobs(counter=None, make_on_frame=None, make_on_checkpoint=None):
+    """Finish every video job that left a checkpoint behind
+
+    Each job is finished with the same kind of detector it started with,
+    rebuilt from the checkpoint. ``counter`` (default: YOLOv4) is only used
+    for checkpoints that do not name their detector.
+    ``make_on_frame(state)`` may return an ``on_frame`` callback for the job,
+    and ``make_on_checkpoint(state)`` its ``on_checkpoint`` callback.
+    """
+    results = {}
+    counters = {}
+    for state in find_checkpoints():
+        print(f"🔄 Resuming interrupted job: {state['output_path']}")
+        on_frame = make_on_frame(state) if make_on_frame else None
+        on_checkpoint = make_on_checkpoint(state) if make_on_checkpoint else None
+        try:
+            spec = state.get('detector')
+            if spec:
+                key = (spec['name'], spec.get('input_size'))
+                if key not in counters:
+                    counters[key] = create_detector(*key)
+                job_counter = counters[key]
+            else:
+                job_counter = counter = counter or create_detector()
+            results[state['output_path']] = process_file_with_counter(
+                job_counter, state['input_path'], state['output_path'], state['file_type'],
+                raw_path=state.get('raw_path'), on_frame=on_frame, on_checkpoint=on_checkpoint,
+                render=state.get('render', True))
+        except Exception as e:
+            print(f"❌ Could not resume {state['output_path']}: {e}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Human counting pipeline')
+    parser.add_argument('--input', '-i', help='Input file path')
+    parser.add_argument('--output', '-o', help='Output file path')
+    parser.add_argument('--resume', action='store_true',
+                       help='Resume all interrupted video jobs')
+    parser.add_argument('--checkpoint-interval', type=int, default=CHECKPOINT_INTERVAL,
+                       help='Frames per checkpointed segment')
+    parser.add_argument('--keep-raw',
+                       help='Save pre-NMS detections to this .npz file for re-thresholding')
+    parser.add_argument('--encoder', choices=['auto', 'ffmpeg', 'opencv'],
+                       help='Video encoder (default: ffmpeg H.264 when available)')
+    parser.add_argument('--preset', help='x264 preset, e.g. veryfast or slow')
+    parser.add_argument('--crf', type=int, help='x264 CRF quality (lower is better)')
+    parser.add_argument('--no-audio', action='store_true', help='Drop the source audio track')
+    parser.add_argument('--sample-fps', type=float,
+                       help='Only count this many frames per second of video')
+    parser.add_argument('--detector', choices=['yolo', 'cascade-ssd', 'cascade-tiny'], default='yolo',
+                       help='YOLOv4 on every frame, or a cheap model escalating hard frames to YOLOv4')
+    parser.add_argument('--processes', type=int,
+                       help='Detect video frames in this many worker processes')
+    parser.add_argument('--reuse-buffers', action='store_true',
+                       help='Decode frames and build network input in preallocated arrays')
+    parser.add_argument('--dedup', type=int, metavar='BITS',
+                       help='Reuse detections for images and sampled frames within this dHash distance (0-1)')
+    parser.add_argument('--count-only', action='store_true',
+                       help='Only count people, without writing an annotated output')
+    parser.add_argument('--reduced-decode', action='store_true',
+                       help='With --count-only, decode oversized images and video at reduced resolution')
+    parser.add_argument('--profile', choices=PROFILE_MODES,
+                       help='Time each stage; cprofile and stacks also save a profile next to the output')
+
+    args = parser.parse_args()
+    counter = create_detector(args.detector)
+
+    if args.resume:
+        for output_path, people_count in resume_interrupted_jobs(counter).items():
+            print(f"✅ {output_path}: {people_count} people")
+        return
+
+    if not args.input or not (args.output or args.count_only):
+        parser.error('--input and --output are required unless --resume is given')
+
+    ext = os.path.splitext(args.input)[1].lower()
+    file_type = 'video' if ext in ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv'] else 'image'
+    if file_type == 'video' and not args.output:
+        # Checkpoints are keyed by the output, see detect_video
+        print("ℹ️ Without --output the count is not checkpointed and cannot be resumed")
+    encoding = {'encoder': args.encoder, 'preset': args.preset, 'crf': args.crf,
+                'audio': False if args.no_audio else None}
+    dedup = None
+    if args.dedup is not None:
+        from scripts.dedup import DetectionCache
+        dedup = DetectionCache(max_distance=args.dedup)
+    profiler = make_profiler(args.profile)
+    counts = []
+    with profiler.job():
+        people_count = process_file_with_counter(counter, args.input, args.output, file_type,
+                                                 args.checkpoint_interval, args.keep_raw,
+                                                 on_frame=lambda i, boxes, t: counts.append((t, len(boxes))),
+                                                 encoding=encoding, sample_fps=args.sample_fps,
+                                                 processes=args.processes,
+                                                 factory=detector_factory(args.detector),
+                                                 reuse_buffers=args.reuse_buffers, dedup=dedup,
+                                                 dedup_frames=True,
+                                                 render=not args.count_only, profiler=profiler,
+                                                 reduced_decode=args.reduced_decode)
+    if args.sample_fps:
+        for offset_seconds, count in counts:
+            print(f"{offset_seconds:10.2f}s  {count}")
+    print(f"✅ Detected {people_count} people")
+    if dedup is not None:
+        stats = dedup.stats()
+        print(f"♻️ Reused detections for {stats['hits']}/{stats['lookups']} frames ({stats['hit_rate']:.0%})")
+    if profiler.enabled:
+        print_report(profiler.report())
+        for path in profiler.save(args.output or args.input):
+            print(f"💾 Profile saved to {path}")
+    if hasattr(counter, 'stats'):
+        stats = counter.stats()
+        print(f"📊 Escalated {stats['escalated']}/{stats['frames']} frames "
+              f"({stats['escalation_rate']:.0%}) to YOLOv4: {stats['reasons']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import queue
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import Future
+from contextlib import contextmanager
+from scripts.frame_ring import FrameRing, DEFAULT_SLOT_BYTES
+
+def _plain_boxes(people_boxes):
+    return [(int(x1), int(y1), int(x2), int(y2), float(confidence))
+            for (x1, y1, x2, y2, confidence) in people_boxes]
+
+def _worker_main(factory, ring, tasks, results):
+    """Load one detector and serve detection tasks until told to stop"""
+    counter = factory()
+    if not counter.load_model():
+        results.put((None, None, "Failed to load model"))
+        return
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        job_id, items, input_size = task
+        try:
+            if input_size and hasattr(counter, 'input_size'):
+                counter.input_size = input_size
+            # Frames in the ring are mapped in place, oversized ones arrive pickled
+            frames = [ring.view(slot, data) if slot is not None else data for slot, data in items]
+            if len(frames) == 1:
+                all_boxes = [counter.detect_people(frames[0])]
+            else:
+                all_boxes = counter.detect_people_batch(frames)
+            del frames
+            results.put((job_id, [_plain_boxes(boxes) for boxes in all_boxes], None))
+        except Exception as e:
+            results.put((job_id, None, str(e)))
+    ring.close()
+
+class DetectorProcesses:
+    """Detector instances running in worker processes, fed through a FrameRing.
+
+    ``factory`` must be picklable (a class or module-level function). Tasks
+    only carry slot indices and shapes; the caller releases the slots once
+    it is done with the frames.
+    """
+
+    def __init__(self, factory, processes=2, slots=None, slot_bytes=DEFAULT_SLOT_BYTES):
+        context = multiprocessing.get_context('spawn')
+        self.ring = FrameRing(context, slots or processes * 4, slot_bytes)
+        self.tasks = context.Queue()
+        self.results = context.Queue()
+        self.workers = [context.Process(target=_worker_main,
+                                        args=(factory, self.ring, self.tasks, self.results),
+                                        daemon=True)
+                        for _ in range(processes)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, job_id, frames, input_size=None):
+        """Copy frames into the ring and queue them; returns the items to release"""
+        items = []
+        for frame in frames:
+            if self.ring.fits(frame.shape, frame.dtype):
+                items.append((self.ring.put(frame), frame.shape))
+            else:
+                items.append((None, frame))
+        self.tasks.put((job_id, items, input_size))
+        return items
+
+    def submit_slot(self, job_id, slot, shape, input_size=None):
+        """Queue a frame that was already written into ``slot``"""
+        self.tasks.put((job_id, [(slot, shape)], input_size))
+
+    def release(self, items):
+        for slot, _ in items:
+            if slot is not None:
+                self.ring.release(slot)
+
+    def result(self, timeout=None):
+        """Next ``(job_id, [people_boxes, ...])`` from any worker"""
+        while True:
+            try:
+                job_id, all_boxes, error = self.results.get(timeout=timeout or 1)
+                break
+            except queue.Empty:
+                if timeout or self.alive() == 0:
+                    raise Exception("Detector processes stopped responding")
+        if error:
+            raise Exception(error)
+        return job_id, all_boxes
+
+    def alive(self):
+        return sum(worker.is_alive() for worker in self.workers)
+
+    def close(self):
+        for _ in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+        self.ring.close()
+
+class RemoteDetector:
+    """Stands in for a detector whose inference runs in a ProcessDetectorPool"""
+
+    def __init__(self, pool, drawer):
+        self.pool = pool
+        self.drawer = drawer
+        self.INPUT_SIZE = getattr(drawer, 'INPUT_SIZE', None)
+        self.input_size = self.INPUT_SIZE
+
+    @property
+    def raw_recorder(self):
+        return None
+
+    @raw_recorder.setter
+    def raw_recorder(self, recorder):
+        if recorder is not None:
+            raise ValueError("Raw detections cannot be kept with process detectors")
+
+    def load_model(self):
+        self.pool.start()
+        return True
+
+    def detect_people(self, frame):
+        return self.pool.detect([frame], self.input_size)[0]
+
+    def detect_people_batch(self, frames):
+        results = []
+        for i in range(0, len(frames), self.pool.batch_size):
+            results.extend(self.pool.detect(frames[i:i + self.pool.batch_size], self.input_size))
+        return results
+
+    def draw_detections(self, frame, people_boxes):
+        return self.drawer.draw_detections(frame, people_boxes)
+
+class ProcessDetectorPool:
+    """DetectorPool counterpart whose detectors live in worker processes.
+
+    Requests from all threads share ``size`` processes. Frames are copied
+    once into a shared-memory ring instead of being pickled, so this scales
+    across cores without paying for moving full-resolution frames.
+    """
+
+    def __init__(self, factory, size=2, batch_size=8, slot_bytes=DEFAULT_SLOT_BYTES):
+        self.factory = factory
+        self.size = size
+        self.batch_size = batch_size
+        self.slot_bytes = slot_bytes
+        self.processes = None
+        self._drawer = None
+        self._futures = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+
+    def start(self):
+        """Start the worker processes on first use"""
+        with self._lock:
+            if self.processes is None:
+                self._drawer = self.factory()
+                self.processes = DetectorProcesses(self.factory, self.size,
+                                                   self.size * self.batch_size, self.slot_bytes)
+                threading.Thread(target=self._dispatch, daemon=True).start()
+        return self.processes
+
+    def _dispatch(self):
+        """Hand results from the workers back to the waiting requests"""
+        while True:
+            job_id, all_boxes, error = self.processes.results.get()
+            if job_id is None:
+                # A worker failed to start, fail everything that is waiting
+                for future in list(self._futures.values()):
+                    future.set_exception(Exception(error))
+                self._futures.clear()
+                continue
+            future = self._futures.pop(job_id, None)
+            if future is None:
+                continue
+            if error:
+                future.set_exception(Exception(error))
+            else:
+                future.set_result(all_boxes)
+
+    def detect(self, frames, input_size=None):
+        """Detect people in up to ``batch_size`` frames on one worker"""
+        processes = self.start()
+        if processes.alive() == 0:
+            raise Exception("Failed to load model")
+        job_id = next(self._ids)
+        future = Future()
+        self._futures[job_id] = future
+        # Take all slots for a request at once so concurrent requests cannot deadlock
+        with self._submit_lock:
+            items = processes.submit(job_id, frames, input_size)
+        try:
+            return future.result()
+        finally:
+            processes.release(items)
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        """Borrow a detector handle for the duration of a ``with`` block"""
+        self.start()
+        yield RemoteDetector(self, self._drawer)
+
+    def warm(self, count=None):
+        """Start the worker processes; each loads its detector in the background"""
+        self.start()
+        return self.size
+
+    def close(self):
+        if self.processes is not None:
+            self.processes.close()
+
+    def stats(self):
+        alive = self.processes.alive() if self.processes else 0
+        return {'size': self.size, 'created': alive, 'pending': len(self._futures)}
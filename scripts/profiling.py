@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# Stages in the order a job goes through them, for reports
+STAGES = ['save', 'decode', 'detect', 'preprocess', 'forward', 'postprocess', 'draw', 'encode', 'copy']
+# Recorded by detectors that support it, inside the pipeline's 'detect' stage
+DETECT_STAGES = ('preprocess', 'forward', 'postprocess')
+
+STACK_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+PROFILE_MODES = ('stages', 'cprofile', 'stacks')
+
+_NULL_STAGE = nullcontext()
+
+class NullProfiler:
+    """Stand-in used when profiling is off; every stage is the same no-op context"""
+    enabled = False
+
+    def stage(self, name):
+        return _NULL_STAGE
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+    def job(self):
+        return _NULL_STAGE
+
+    def report(self):
+        return None
+
+    def save(self, base_path):
+        return []
+
+NULL_PROFILER = NullProfiler()
+
+class StageProfiler:
+    """Wall and CPU time spent in each stage of one job.
+
+    ``stage(name)`` wraps a piece of work; repeated stages (one per frame)
+    are summed. CPU time is that of the calling thread, so work handed to
+    encoder threads or processes shows up as wall time of the stage that
+    waits for it. ``mode`` 'cprofile' also runs the job under cProfile and
+    'stacks' samples the job's thread into collapsed stacks for flame graphs.
+    """
+    enabled = True
+
+    def __init__(self, mode='stages'):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.stages = {}
+        self.started = None
+        self.finished = None
+        self._cprofile = None
+        self._sampler = None
+
+    @contextmanager
+    def stage(self, name):
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+    def add(self, name, wall_seconds, cpu_seconds=0.0):
+        stats = self.stages.setdefault(name, [0.0, 0.0, 0])
+        stats[0] += wall_seconds
+        stats[1] += cpu_seconds
+        stats[2] += 1
+
+    def start(self):
+        self.started = time.perf_counter()
+        if self.mode == 'cprofile':
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        elif self.mode == 'stacks':
+            self._sampler = StackSampler(threading.get_ident())
+            self._sampler.start()
+        return self
+
+    def stop(self):
+        if self.finished is not None:
+            return
+        self.finished = time.perf_counter()
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+
+    @contextmanager
+    def job(self):
+        """Profile everything inside the block as one job"""
+        self.start()
+        try:
+            yield self
+        finally:
+            self.stop()
+
+    def report(self):
+        """Stage breakdown as plain data for JSON responses"""
+        total = ((self.finished or time.perf_counter()) - self.started) if self.started else None
+        order = [s for s in STAGES if s in self.stages] + sorted(set(self.stages) - set(STAGES))
+        stages = {name: {'wall_ms': round(self.stages[name][0] * 1000, 2),
+                         'cpu_ms': round(self.stages[name][1] * 1000, 2),
+                         'calls': self.stages[name][2]}
+                  for name in order}
+        report = {'mode': self.mode, 'stages': stages}
+        if total is not None:
+            report['total_ms'] = round(total * 1000, 2)
+            top_level = sum(s['wall_ms'] for name, s in stages.items() if name not in DETECT_STAGES)
+            report['other_ms'] = round(max(0.0, report['total_ms'] - top_level), 2)
+        if self._cprofile is not None:
+            report['top_functions'] = self._top_functions()
+        if self._sampler is not None:
+            report['stack_samples'] = sum(self._sampler.stacks.values())
+        return report
+
+    def _top_functions(self, limit=25):
+        import pstats
+        stats = pstats.Stats(self._cprofile)
+        rows = []
+        for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+            rows.append({'function': f"{os.path.basename(filename)}:{line}({function})",
+                         'calls': calls, 'own_ms': round(own * 1000, 2),
+                         'cumulative_ms': round(cumulative * 1000, 2)})
+        rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+        return rows[:limit]
+
+    def save(self, base_path):
+        """Write the report, and any cProfile or stack dump, next to ``base_path``
+
+        Returns the paths written.
+        """
+        stem = os.path.splitext(base_path)[0]
+        paths = [stem + ".profile.json"]
+        with open(paths[0], "w") as f:
+            json.dump(self.report(), f, indent=2)
+        if self._cprofile is not None:
+            paths.append(stem + ".prof")
+            self._cprofile.dump_stats(paths[-1])
+        if self._sampler is not None:
+            paths.append(stem + ".stacks.txt")
+            self._sampler.save(paths[-1])
+        return paths
+
+def make_profiler(mode=None):
+    """A StageProfiler for ``mode`` ('stages', 'cprofile' or 'stacks'), or the null profiler"""
+    if not mode:
+        return NULL_PROFILER
+    return StageProfiler(mode)
+
+def print_report(report):
+    print(f"⏱️ Profile ({report['mode']}), total {report.get('total_ms', 0):.1f} ms")
+    print(f"   {'stage':<12} {'calls':>7} {'wall ms':>10} {'cpu ms':>10}")
+    for name, stats in report['stages'].items():
+        print(f"   {name:<12} {stats['calls']:>7} {stats['wall_ms']:>10.1f} {stats['cpu_ms']:>10.1f}")
+    for row in report.get('top_functions', [])[:10]:
+        print(f"   {row['cumulative_ms']:>10.1f} ms  {row['function']}")
+
+class StackSampler:
+    """Samples one thread's Python stack into collapsed ``a;b;c count`` lines
+
+    The output can be fed to flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, thread_id, interval=STACK_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def save(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
@@ -0,0 +1,120 @@
+import threading
+
+# Ordered from best quality to cheapest. Input sizes must be multiples of 32.
+QUALITY_TIERS = [
+    {'name': 'full', 'input_size': 416, 'stride': 1},
+    {'name': 'reduced', 'input_size': 320, 'stride': 1},
+    {'name': 'low', 'input_size': 320, 'stride': 2},
+    {'name': 'minimal', 'input_size': 256, 'stride': 3},
+]
+
+class QualityController:
+    """Trades detector input size and frame stride for latency under load.
+
+    Per-frame latency is smoothed with an exponential moving average. When it
+    breaks the SLO, or too many jobs are in flight, for ``step_down_after``
+    consecutive observations, the controller moves to the next cheaper tier.
+    It only steps back up after ``step_up_after`` observations with latency
+    below ``headroom`` of the SLO and a short queue.
+    """
+
+    def __init__(self, latency_slo_ms=250, max_queue_depth=4, tiers=QUALITY_TIERS,
+                 headroom=0.6, step_down_after=5, step_up_after=50, smoothing=0.2):
+        self.tiers = tiers
+        self.latency_slo_ms = latency_slo_ms
+        self.max_queue_depth = max_queue_depth
+        self.headroom = headroom
+        self.step_down_after = step_down_after
+        self.step_up_after = step_up_after
+        self.smoothing = smoothing
+
+        self.level = 0
+        self.queue_depth = 0
+        self.latency_ms = None
+        self._over = 0
+        self._under = 0
+        self._lock = threading.Lock()
+
+    def current_tier(self):
+        return self.tiers[self.level]
+
+    def start_job(self):
+        """Register an in-flight job and return its quality handle"""
+        with self._lock:
+            self.queue_depth += 1
+            self._check_queue()
+        return JobQuality(self)
+
+    def finish_job(self):
+        with self._lock:
+            self.queue_depth = max(0, self.queue_depth - 1)
+
+    def observe(self, latency_ms):
+        """Feed the latency of one output frame and adjust the tier"""
+        with self._lock:
+            if self.latency_ms is None:
+                self.latency_ms = latency_ms
+            else:
+                self.latency_ms += self.smoothing * (latency_ms - self.latency_ms)
+
+            overloaded = (self.latency_ms > self.latency_slo_ms
+                          or self.queue_depth > self.max_queue_depth)
+            idle = (self.latency_ms < self.headroom * self.latency_slo_ms
+                    and self.queue_depth <= self.max_queue_depth // 2)
+
+            if overloaded:
+                self._over += 1
+                self._under = 0
+                if self._over >= self.step_down_after:
+                    self._step(1)
+            elif idle:
+                self._under += 1
+                self._over = 0
+                if self._under >= self.step_up_after:
+                    self._step(-1)
+            else:
+                self._over = 0
+                self._under = 0
+
+    def _check_queue(self):
+        # A burst of new jobs should not wait for latency to catch up
+        if self.queue_depth > self.max_queue_depth:
+            self._step(1)
+
+    def _step(self, direction):
+        self.level = min(max(self.level + direction, 0), len(self.tiers) - 1)
+        self._over = 0
+        self._under = 0
+
+    def stats(self):
+        return {
+            'tier': self.current_tier()['name'],
+            'queue_depth': self.queue_depth,
+            'latency_ms': self.latency_ms,
+            'latency_slo_ms': self.latency_slo_ms
+        }
+
+class JobQuality:
+    """Quality handle for one job; remembers the cheapest tier it used"""
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.worst_level = controller.level
+        self.finished = False
+
+    def tier(self):
+        level = self.controller.level
+        self.worst_level = max(self.worst_level, level)
+        return self.controller.tiers[level]
+
+    def observe(self, latency_ms):
+        self.controller.observe(latency_ms)
+
+    @property
+    def tier_name(self):
+        return self.controller.tiers[self.worst_level]['name']
+
+    def finish(self):
+        if not self.finished:
+            self.finished = True
+            self.controller.finish_job()
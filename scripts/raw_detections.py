@@ -0,0 +1,171 @@
+import os
+import argparse
+import cv2
+import numpy as np
+from scripts.main_yolo import HumanCounterYOLO, select_people
+from scripts.video_io import open_video_writer
+
+# Candidates below this score are dropped even when recording raw detections
+RAW_MIN_CONFIDENCE = 0.1
+
+class RawDetectionRecorder:
+    """Collects pre-NMS person candidates per frame in compact arrays.
+
+    Boxes are stored as one int32 ``[x, y, w, h]`` array and one float32
+    score array for the whole job, with ``frame_offsets`` marking where each
+    frame's candidates start, so a re-threshold pass never has to run the
+    network again.
+    """
+
+    def __init__(self, min_confidence=RAW_MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+        self.boxes = []
+        self.scores = []
+        self.source_path = ''
+        self.width = 0
+        self.height = 0
+        self.fps = 0.0
+
+    @classmethod
+    def load(cls, path):
+        """Continue recording into a previously saved file"""
+        raw = load_raw_detections(path)
+        recorder = cls(raw['min_confidence'])
+        recorder.set_source(raw['source_path'], raw['width'], raw['height'], raw['fps'])
+        offsets = raw['frame_offsets']
+        for i in range(len(offsets) - 1):
+            recorder.boxes.append(raw['boxes'][offsets[i]:offsets[i + 1]])
+            recorder.scores.append(raw['scores'][offsets[i]:offsets[i + 1]])
+        return recorder
+
+    @property
+    def frame_count(self):
+        return len(self.boxes)
+
+    def set_source(self, source_path, width, height, fps=0.0):
+        self.source_path = source_path
+        self.width = width
+        self.height = height
+        self.fps = fps
+
+    def add(self, boxes, scores):
+        """Record the candidates of the next frame"""
+        keep = scores > self.min_confidence
+        self.boxes.append(np.asarray(boxes, dtype=np.int32)[keep].reshape(-1, 4))
+        self.scores.append(np.asarray(scores, dtype=np.float32)[keep])
+
+    def repeat_last(self):
+        """Record the previous frame's candidates again for a frame that was not detected"""
+        if self.boxes:
+            self.boxes.append(self.boxes[-1])
+            self.scores.append(self.scores[-1])
+        else:
+            self.add(np.zeros((0, 4), np.int32), np.zeros(0, np.float32))
+
+    def truncate(self, frame_count):
+        """Forget frames recorded after ``frame_count`` (used when resuming)"""
+        del self.boxes[frame_count:]
+        del self.scores[frame_count:]
+
+    def save(self, path):
+        """Write all recorded frames to a compressed ``.npz`` file"""
+        counts = [len(s) for s in self.scores]
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            frame_offsets=offsets,
+            boxes=np.concatenate(self.boxes) if self.boxes else np.zeros((0, 4), np.int32),
+            scores=np.concatenate(self.scores) if self.scores else np.zeros(0, np.float32),
+            source_path=np.array(self.source_path),
+            size=np.array([self.width, self.height], dtype=np.int32),
+            fps=np.array(self.fps, dtype=np.float32),
+            min_confidence=np.array(self.min_confidence, dtype=np.float32)
+        )
+        os.replace(tmp_path, path)
+        return path
+
+def load_raw_detections(path):
+    """Load a file written by RawDetectionRecorder.save"""
+    with np.load(path) as data:
+        return {
+            'frame_offsets': data['frame_offsets'],
+            'boxes': data['boxes'],
+            'scores': data['scores'],
+            'source_path': str(data['source_path']),
+            'width': int(data['size'][0]),
+            'height': int(data['size'][1]),
+            'fps': float(data['fps']),
+            # Stored as float32, so 0.1 comes back as 0.10000000149
+            'min_confidence': round(float(data['min_confidence']), 6)
+        }
+
+def rethreshold(raw, confidence_threshold, nms_threshold):
+    """Recompute the people boxes of every frame from stored candidates"""
+    if confidence_threshold < raw['min_confidence']:
+        raise ValueError(f"Confidence threshold must be at least {raw['min_confidence']:.2f}, "
+                         "lower scores were not recorded")
+
+    offsets = raw['frame_offsets']
+    frames = []
+    for i in range(len(offsets) - 1):
+        start, end = offsets[i], offsets[i + 1]
+        frames.append(select_people(raw['boxes'][start:end], raw['scores'][start:end],
+                                    confidence_threshold, nms_threshold))
+    return frames
+
+def render_overlay(raw, frame_boxes, output_path, source_path=None):
+    """Re-decode the source and draw the given boxes, without running the detector"""
+    source_path = source_path or raw['source_path']
+    drawer = HumanCounterYOLO()
+
+    if len(frame_boxes) == 1 and raw['fps'] == 0:
+        frame = cv2.imread(source_path)
+        if frame is None:
+            raise Exception("Could not read image file")
+        result_frame, _ = drawer.draw_detections(frame, frame_boxes[0])
+        cv2.imwrite(output_path, result_frame)
+        return output_path
+
+    cap = cv2.VideoCapture(source_path)
+    if not cap.isOpened():
+        raise Exception("Could not open video file")
+
+    out = open_video_writer(output_path, raw['fps'], (raw['width'], raw['height']),
+                            audio_source=source_path)
+    for people_boxes in frame_boxes:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        result_frame, _ = drawer.draw_detections(frame, people_boxes)
+        out.write(result_frame)
+    cap.release()
+    out.release()
+    return output_path
+
+def main():
+    parser = argparse.ArgumentParser(description='Recount stored raw detections with new thresholds')
+    parser.add_argument('raw', help='Raw detections file (.npz)')
+    parser.add_argument('--confidence', type=float, default=0.5, help='Confidence threshold')
+    parser.add_argument('--nms', type=float, default=0.4, help='NMS threshold')
+    parser.add_argument('--render', help='Write an annotated copy of the source to this path')
+    parser.add_argument('--source', help='Source file, if it moved since processing')
+
+    args = parser.parse_args()
+    raw = load_raw_detections(args.raw)
+    frame_boxes = rethreshold(raw, args.confidence, args.nms)
+    counts = [len(boxes) for boxes in frame_boxes]
+
+    print(f"Frames: {len(counts)}")
+    print(f"Max people: {max(counts, default=0)}")
+    if counts:
+        print(f"Mean people: {sum(counts) / len(counts):.2f}")
+
+    if args.render:
+        render_overlay(raw, frame_boxes, args.render, args.source)
+        print(f"Result saved to: {args.render}")
+
+if __name__ == "__main__":
+    main()
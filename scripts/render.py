@@ -0,0 +1,166 @@
+import os
+import argparse
+import threading
+import cv2
+from scripts.main_yolo import HumanCounterYOLO
+from scripts.video_io import open_video_writer, encoding_options
+
+# Drawing options; anything but the defaults is cached as a separate file
+DEFAULT_STYLE = {'show_confidence': False}
+
+def render_style(overrides=None):
+    style = dict(DEFAULT_STYLE)
+    if overrides:
+        style.update({k: v for k, v in overrides.items() if k in DEFAULT_STYLE and v is not None})
+    return style
+
+def render_media(source_path, file_type, frames, output_path, style=None, encoding=None):
+    """Re-decode ``source_path`` and draw stored ``(frame_index, people_boxes)`` onto it
+
+    Videos whose frames were sampled are rendered with only those frames,
+    played back at the sampling rate, like process_video_sampled writes them.
+    """
+    style = render_style(style)
+    drawer = HumanCounterYOLO()
+
+    if file_type == 'image':
+        frame = cv2.imread(source_path)
+        if frame is None:
+            raise Exception("Could not read image file")
+        people_boxes = frames[0][1] if frames else []
+        result_frame, _ = drawer.draw_detections(frame, people_boxes, **style)
+        cv2.imwrite(output_path, result_frame)
+        return output_path
+
+    cap = cv2.VideoCapture(source_path)
+    if not cap.isOpened():
+        raise Exception("Could not open video file")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    wanted = dict(frames)
+    step = frames[1][0] - frames[0][0] if len(frames) > 1 else 1
+    encoding = encoding_options(encoding)
+    # Audio only lines up when every frame is kept
+    out = open_video_writer(output_path, fps / step, (width, height), encoding,
+                            audio_source=source_path if step == 1 else None)
+    try:
+        for frame_index in range(frames[-1][0] + 1 if frames else 0):
+            if frame_index not in wanted:
+                if not cap.grab():
+                    break
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            result_frame, _ = drawer.draw_detections(frame, wanted[frame_index], **style)
+            out.write(result_frame)
+    finally:
+        cap.release()
+        out.release()
+    return output_path
+
+class Renderer:
+    """Renders annotated outputs on first request from a DetectionIndex
+
+    Jobs processed without rendering only leave their detections in the
+    index. The first request for an output decodes the source again, draws
+    the stored boxes and keeps the file; later requests are served from it.
+    The default style is cached under the job's own output name, other
+    styles next to it in ``cache_dir``. Long videos are rendered in the
+    background with ``start`` so no request has to wait for them.
+    """
+
+    def __init__(self, index, output_dir, cache_dir=None, encoding=None):
+        self.index = index
+        self.output_dir = output_dir
+        self.cache_dir = cache_dir or os.path.join(output_dir, "renders")
+        self.encoding = encoding
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._errors = {}
+
+    def path_for(self, output_filename, style=None):
+        style = render_style(style)
+        if style == DEFAULT_STYLE:
+            return os.path.join(self.output_dir, output_filename)
+        stem, ext = os.path.splitext(output_filename)
+        suffix = '.'.join(k for k, v in sorted(style.items()) if v)
+        return os.path.join(self.cache_dir, f"{stem}.{suffix}{ext}")
+
+    def render(self, output_filename, style=None):
+        """Path of the rendered output, or None if the job or its source is unknown"""
+        path = self.path_for(output_filename, style)
+        with self._lock:
+            lock = self._locks.setdefault(path, threading.Lock())
+        with lock:
+            if os.path.exists(path):
+                return path
+            job = self.index.job_by_output(output_filename)
+            if job is None or not job['source_path'] or not os.path.exists(job['source_path']):
+                return None
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            stem, ext = os.path.splitext(path)
+            tmp_path = f"{stem}.tmp{ext}"
+            render_media(job['source_path'], job['file_type'], self.index.frame_boxes(job['id']),
+                         tmp_path, style, self.encoding)
+            os.replace(tmp_path, path)
+            print(f"🖌️ Rendered {os.path.basename(path)}")
+        return path
+
+    def start(self, output_filename, style=None):
+        """Render in a background thread unless the output already exists
+
+        Returns ``(status, value)``: ``('ready', path)``, ``('rendering', None)``,
+        ``('failed', error)`` once for a render that raised (the next call
+        retries it), or ``('missing', None)`` for an unknown job or source.
+        """
+        path = self.path_for(output_filename, style)
+        if os.path.exists(path):
+            return 'ready', path
+        with self._lock:
+            if path in self._errors:
+                return 'failed', self._errors.pop(path)
+            if path in self._pending:
+                return 'rendering', None
+        job = self.index.job_by_output(output_filename)
+        if job is None or not job['source_path'] or not os.path.exists(job['source_path']):
+            return 'missing', None
+        with self._lock:
+            if path not in self._pending:
+                self._pending[path] = threading.Thread(target=self._render_pending,
+                                                       args=(output_filename, style, path), daemon=True)
+                self._pending[path].start()
+        return 'rendering', None
+
+    def _render_pending(self, output_filename, style, path):
+        try:
+            self.render(output_filename, style)
+        except Exception as e:
+            print(f"❌ Rendering {os.path.basename(path)} failed: {e}")
+            with self._lock:
+                self._errors[path] = str(e)
+        finally:
+            with self._lock:
+                self._pending.pop(path, None)
+
+def main():
+    from scripts.detection_index import DetectionIndex, INDEX_PATH
+
+    parser = argparse.ArgumentParser(description='Render annotated outputs from indexed detections')
+    parser.add_argument('output_filename', help='Output name of the job, as in the index')
+    parser.add_argument('--index', default=INDEX_PATH, help='Detection index database')
+    parser.add_argument('--dir', default='processed', help='Directory of processed outputs')
+    parser.add_argument('--show-confidence', action='store_true', help='Label boxes with their score')
+
+    args = parser.parse_args()
+    renderer = Renderer(DetectionIndex(args.index), args.dir)
+    path = renderer.render(args.output_filename, {'show_confidence': args.show_confidence})
+    if path is None:
+        raise SystemExit("❌ Job or its source file not found")
+    print(f"✅ {path}")
+
+if __name__ == "__main__":
+    main()
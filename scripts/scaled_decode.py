@@ -0,0 +1,143 @@
+import struct
+import cv2
+import numpy as np
+from scripts.video_io import FFmpegReader, ffmpeg_available
+
+# Power-of-two reductions libjpeg can apply while decoding
+REDUCED_FLAGS = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+JPEG_EXTENSIONS = ('.jpg', '.jpeg', '.jpe', '.jfif')
+
+# Start-of-frame markers carrying the image size (DHT, JPG and DAC share the range)
+_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+def jpeg_size(path):
+    """``(width, height)`` from a JPEG's frame header, or None if it is not a JPEG"""
+    with open(path, 'rb') as f:
+        if f.read(2) != b'\xff\xd8':
+            return None
+        while True:
+            byte = f.read(1)
+            if byte != b'\xff':
+                return None
+            marker = f.read(1)
+            while marker == b'\xff':  # fill bytes
+                marker = f.read(1)
+            if not marker:
+                return None
+            code = marker[0]
+            if code == 0x01 or 0xD0 <= code <= 0xD8:
+                continue  # markers without a length
+            length = f.read(2)
+            if len(length) < 2:
+                return None
+            if code in _SOF_MARKERS:
+                header = f.read(5)
+                if len(header) < 5:
+                    return None
+                _, height, width = struct.unpack('>BHH', header)
+                return width, height
+            f.seek(struct.unpack('>H', length)[0] - 2, 1)
+
+def decode_factor(width, height, min_side, max_factor=8):
+    """Largest power-of-two reduction that keeps the short side at least ``min_side``"""
+    factor = 1
+    while factor < max_factor and min(width, height) // (factor * 2) >= min_side:
+        factor *= 2
+    return factor
+
+def scaled_size(width, height, min_side):
+    """Detection size for a ``width`` x ``height`` source, or None to keep it as is"""
+    factor = decode_factor(width, height, min_side)
+    if factor == 1:
+        return None
+    return width // factor, height // factor
+
+def read_image_scaled(path, min_side):
+    """Read an image with its short side reduced towards ``min_side``
+
+    JPEGs are decoded at 1/2, 1/4 or 1/8 size by libjpeg itself, which
+    skips most of the IDCT work and never holds the full-size pixels. Other
+    formats are decoded in full. Returns ``(frame, scale)`` with ``scale``
+    the ``(x, y)`` factors from frame to source coordinates, or None.
+    """
+    size = jpeg_size(path) if path.lower().endswith(JPEG_EXTENSIONS) else None
+    factor = decode_factor(*size, min_side) if size else 1
+    if factor == 1:
+        return cv2.imread(path), None
+    frame = cv2.imread(path, REDUCED_FLAGS[factor])
+    if frame is None:
+        return None, None
+    width, height = size
+    if (frame.shape[1] >= frame.shape[0]) != (width >= height):
+        width, height = height, width  # rotated by the EXIF orientation
+    return frame, (width / frame.shape[1], height / frame.shape[0])
+
+def scale_boxes(people_boxes, scale):
+    """Map ``(x1, y1, x2, y2, confidence)`` boxes from a scaled frame back to the source"""
+    if not scale:
+        return people_boxes
+    sx, sy = scale
+    return [(int(round(x1 * sx)), int(round(y1 * sy)), int(round(x2 * sx)), int(round(y2 * sy)), confidence)
+            for (x1, y1, x2, y2, confidence) in people_boxes]
+
+class DownscaledCapture:
+    """Wraps a cv2.VideoCapture, shrinking every frame to ``size`` right after decoding
+
+    Only one full-size frame is kept, reused for every read; detection,
+    hashing and buffers downstream work on the small copy.
+    """
+
+    def __init__(self, cap, size):
+        self.cap = cap
+        self.size = size
+        self._full = None
+
+    def read(self, frame_buffer=None):
+        if not self.cap.grab():
+            return False, None
+        return self.retrieve(frame_buffer)
+
+    def grab(self):
+        return self.cap.grab()
+
+    def retrieve(self, frame_buffer=None):
+        ret, self._full = self.cap.retrieve(self._full)
+        if not ret:
+            return False, None
+        return True, cv2.resize(self._full, self.size, dst=frame_buffer, interpolation=cv2.INTER_AREA)
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.cap.release()
+        self._full = None
+
+def open_scaled_capture(input_path, cap, min_side, sequential=True):
+    """Capture yielding frames reduced towards ``min_side``, and their ``(x, y)`` scale
+
+    ``cap`` is the already opened cv2.VideoCapture. For ``sequential``
+    reads with ffmpeg installed, it is replaced by an ffmpeg process that
+    scales in YUV before converting to BGR, so no full-size BGR frame is
+    ever made. Otherwise frames are shrunk right after OpenCV decodes them.
+    Returns ``(cap, None)`` when the video is small enough already.
+    """
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    size = scaled_size(width, height, min_side)
+    if size is None:
+        return cap, None
+    scale = (width / size[0], height / size[1])
+    if sequential and ffmpeg_available():
+        cap.release()
+        return FFmpegReader(input_path, size), scale
+    return DownscaledCapture(cap, size), scale
+
+def frame_buffer_for(scale, width, height):
+    """Preallocated BGR buffer for frames of a capture from open_scaled_capture"""
+    if scale:
+        width, height = int(round(width / scale[0])), int(round(height / scale[1]))
+    return np.empty((height, width, 3), np.uint8)
@@ -0,0 +1,260 @@
+import os
+import re
+import queue
+import shutil
+import tempfile
+import subprocess
+import threading
+import cv2
+import numpy as np
+
+# Defaults for annotated video output
+DEFAULT_ENCODING = {
+    'encoder': 'auto',    # 'auto', 'ffmpeg' or 'opencv'
+    'preset': 'veryfast', # x264 preset: ultrafast ... veryslow
+    'crf': 23,            # x264 quality, lower is better and larger
+    'audio': True         # copy the source audio track into the final output
+}
+
+# Frames buffered between the inference loop and the encoder
+WRITE_QUEUE_SIZE = 32
+
+# Length of the segments of a progressive HLS preview
+HLS_SEGMENT_SECONDS = 4
+
+# When sampling, seek instead of grabbing once the gap is at least this many frames
+SEEK_MIN_STEP = 90
+
+# Source audio codecs the MP4 muxer takes as they are; others are re-encoded to AAC
+MP4_AUDIO_CODECS = ('aac', 'mp3', 'alac', 'ac3', 'eac3')
+
+def ffmpeg_available():
+    return shutil.which("ffmpeg") is not None
+
+def audio_codec(path):
+    """Codec of the first audio stream of ``path``, or None, from ffmpeg's stream listing"""
+    result = subprocess.run(["ffmpeg", "-hide_banner", "-i", path], capture_output=True, text=True)
+    match = re.search(r"Stream #\S+.*?: Audio: (\w+)", result.stderr)
+    return match.group(1) if match else None
+
+def encoding_options(overrides=None):
+    options = dict(DEFAULT_ENCODING)
+    if overrides:
+        options.update({k: v for k, v in overrides.items() if v is not None})
+    return options
+
+class OpenCVWriter:
+    """cv2.VideoWriter fallback, preferring H.264 when OpenCV was built with it"""
+
+    def __init__(self, path, fps, size):
+        self.path = path
+        for codec in ('avc1', 'mp4v'):
+            self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, size)
+            if self.writer.isOpened():
+                break
+        self.codec = codec
+
+    def write(self, frame):
+        self.writer.write(frame)
+
+    def release(self):
+        self.writer.release()
+
+class FFmpegWriter:
+    """Pipes raw BGR frames to an ffmpeg subprocess encoding H.264.
+
+    Frames are handed to a background thread through a bounded queue, so
+    the inference loop only pays for a memory copy while ffmpeg encodes in
+    its own process.
+    """
+
+    def __init__(self, path, fps, size, preset='veryfast', crf=23, audio_source=None,
+                 faststart=True):
+        self.path = path
+        width, height = size
+        cmd = ["ffmpeg", "-y", "-loglevel", "error",
+               "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}",
+               "-r", str(fps or 25), "-i", "-"]
+        if audio_source:
+            # Pass the audio through untouched when MP4 can hold it
+            codec = "copy" if audio_codec(audio_source) in MP4_AUDIO_CODECS else "aac"
+            cmd += ["-i", audio_source, "-map", "0:v:0", "-map", "1:a:0?", "-c:a", codec, "-shortest"]
+        cmd += ["-c:v", "libx264", "-preset", preset, "-crf", str(crf), "-pix_fmt", "yuv420p"]
+        cmd += self.output_args(path, faststart)
+
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        self.queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self.error = None
+        self.thread = threading.Thread(target=self._pump, daemon=True)
+        self.thread.start()
+
+    def output_args(self, path, faststart):
+        """Muxer options and output file of the ffmpeg command"""
+        if faststart:
+            return ["-movflags", "+faststart", path]
+        return [path]
+
+    def _pump(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            if self.error is None:
+                try:
+                    self.process.stdin.write(data)
+                except (BrokenPipeError, OSError) as e:
+                    self.error = e
+
+    def write(self, frame):
+        if self.error is not None:
+            raise Exception(f"ffmpeg encoder failed: {self.error}")
+        self.queue.put(frame.tobytes())
+
+    def release(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.process.stdin.close()
+        if self.process.wait() != 0 or self.error is not None:
+            raise Exception(f"ffmpeg exited with code {self.process.returncode}")
+
+class FFmpegReader:
+    """Reads a video through ffmpeg, scaled to ``size`` before the BGR conversion.
+
+    Has the ``read``/``release`` part of cv2.VideoCapture's interface.
+    Every decoded frame is passed through unchanged in count, so frame
+    indices match OpenCV's.
+    """
+
+    def __init__(self, path, size):
+        width, height = size
+        self.path = path
+        self.size = size
+        self.frame_bytes = width * height * 3
+        self.frames = 0
+        cmd = ["ffmpeg", "-loglevel", "error", "-i", path, "-an", "-sn",
+               "-vf", f"scale={width}:{height}:flags=area", "-vsync", "0",
+               "-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+        # A file rather than a pipe, so a chatty ffmpeg never blocks on it
+        self.stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL,
+                                        stderr=self.stderr)
+
+    def read(self, frame_buffer=None):
+        width, height = self.size
+        frame = frame_buffer if frame_buffer is not None else np.empty((height, width, 3), np.uint8)
+        view = memoryview(frame.reshape(-1))
+        filled = 0
+        while filled < self.frame_bytes:
+            n = self.process.stdout.readinto(view[filled:])
+            if not n:
+                self._check_exit()
+                return False, None
+            filled += n
+        self.frames += 1
+        return True, frame
+
+    def _check_exit(self):
+        """At the end of the stream, raise if ffmpeg failed rather than ending the video early"""
+        if self.process.wait() == 0 and self.frames:
+            return
+        self.stderr.seek(0)
+        message = self.stderr.read().decode(errors='replace').strip().splitlines()
+        detail = message[-1] if message else f"exit code {self.process.returncode}"
+        if self.process.returncode == 0:
+            detail = "no frames decoded"
+        raise Exception(f"ffmpeg could not decode {self.path} after {self.frames} frames: {detail}")
+
+    def release(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.stdout.close()
+        self.process.wait()
+        self.stderr.close()
+
+class HLSWriter(FFmpegWriter):
+    """Encodes H.264 into short fragmented-MP4 segments listed in a growing HLS playlist.
+
+    The playlist is of the ``event`` type: players can start from the first
+    segment while later ones are still being encoded, and ffmpeg marks the
+    playlist as finished on release.
+    """
+
+    def __init__(self, playlist_path, fps, size, preset='veryfast', crf=23,
+                 segment_seconds=HLS_SEGMENT_SECONDS):
+        self.segment_seconds = segment_seconds
+        os.makedirs(os.path.dirname(playlist_path) or '.', exist_ok=True)
+        super().__init__(playlist_path, fps, size, preset, crf, faststart=False)
+
+    def output_args(self, path, faststart):
+        segment_pattern = os.path.join(os.path.dirname(path), "segment_%05d.m4s")
+        return ["-force_key_frames", f"expr:gte(t,n_forced*{self.segment_seconds})",
+                "-f", "hls", "-hls_time", str(self.segment_seconds),
+                "-hls_playlist_type", "event", "-hls_segment_type", "fmp4",
+                "-hls_segment_filename", segment_pattern, path]
+
+def remux_playlist(playlist_path, output_path, audio_source=None):
+    """Join the segments of a finished HLS playlist into one MP4 without re-encoding"""
+    cmd = ["ffmpeg", "-y", "-loglevel", "error", "-i", playlist_path]
+    if audio_source:
+        cmd += ["-i", audio_source, "-map", "0:v:0", "-map", "1:a:0?", "-shortest"]
+    cmd += ["-c:v", "copy", "-movflags", "+faststart"]
+    if not audio_source:
+        joined = subprocess.run(cmd + [output_path]).returncode == 0
+    else:
+        # Pass the audio through untouched, or re-encode it if MP4 cannot hold the codec
+        codec = "copy" if audio_codec(audio_source) in MP4_AUDIO_CODECS else "aac"
+        joined = subprocess.run(cmd + ["-c:a", codec, output_path]).returncode == 0
+        if not joined and codec == "copy":
+            joined = subprocess.run(cmd + ["-c:a", "aac", output_path]).returncode == 0
+    if not joined:
+        raise Exception("Could not join the HLS segments")
+    return output_path
+
+def open_video_writer(path, fps, size, encoding=None, audio_source=None, faststart=True):
+    """Open the configured encoder for an annotated output video"""
+    options = encoding_options(encoding)
+    use_ffmpeg = options['encoder'] == 'ffmpeg' or (options['encoder'] == 'auto' and ffmpeg_available())
+    if use_ffmpeg:
+        return FFmpegWriter(path, fps, size, options['preset'], options['crf'],
+                            audio_source if options['audio'] else None, faststart)
+    return OpenCVWriter(path, fps, size)
+
+def sampling_step(source_fps, sample_fps):
+    """Number of source frames per sampled frame"""
+    if not sample_fps or sample_fps <= 0:
+        return 1
+    return max(1, int(round((source_fps or 25) / sample_fps)))
+
+def iter_sampled_frames(cap, step, start_index=0, frame_buffer=None):
+    """Yield ``(frame_index, frame)`` for every ``step``-th frame of a capture
+
+    Frames in between are skipped with ``grab()``, which demuxes without
+    decoding to BGR, and only sampled frames are ``retrieve()``d. For large
+    gaps, containers that support it are seeked instead. Frames are decoded
+    into ``frame_buffer`` when given, so each yielded frame is only valid
+    until the next one.
+    """
+    frame_index = start_index
+    seek = step >= SEEK_MIN_STEP and _can_seek(cap, start_index)
+
+    while cap.grab():
+        ret, frame = cap.retrieve(frame_buffer)
+        if not ret:
+            break
+        yield frame_index, frame
+
+        frame_index += step
+        if seek:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        else:
+            for _ in range(step - 1):
+                if not cap.grab():
+                    return
+
+def _can_seek(cap, position):
+    """Check if the capture honours frame seeks, leaving it at ``position``"""
+    probe = position + 1
+    cap.set(cv2.CAP_PROP_POS_FRAMES, probe)
+    seekable = int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == probe
+    cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+    return seekable and int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == position
@@ -0,0 +1,218 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import socket
+import argparse
+import threading
+from flask import Flask, request, jsonify, send_from_directory, abort
+from scripts.cluster import http_json, token_matches, HEARTBEAT_SECONDS, CLUSTER_TOKEN, TOKEN_HEADER
+from scripts.detector_pool import DetectorPool
+from scripts.detectors import detector_factory
+
+WORK_ROOT = "processed/worker"
+TASK_MAX_AGE = 3600  # seconds before files of unfetched tasks are removed
+TASK_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')  # uuid4().hex, see new_task
+
+def make_detector(detector='yolo'):
+    return detector_factory(detector)
+
+def _plain_boxes(people_boxes):
+    return [[int(x1), int(y1), int(x2), int(y2), round(float(confidence), 4)]
+            for (x1, y1, x2, y2, confidence) in people_boxes]
+
+def create_worker_app(pool, work_root=WORK_ROOT, token=None):
+    """Flask app serving detection tasks from a pool of warm detectors
+
+    Tasks are answered synchronously with counts and per-frame boxes; the
+    annotated files stay under ``/results`` until the coordinator deletes
+    the task. Every route but ``/healthz`` needs the cluster token
+    (default: CLUSTER_TOKEN) in the X-Cluster-Token header.
+    """
+    token = token or CLUSTER_TOKEN
+    if not token:
+        raise Exception("Set the CLUSTER_TOKEN environment variable to serve cluster tasks")
+    app = Flask(__name__)
+    state = {'active': 0, 'completed': 0, 'failed': 0}
+    lock = threading.Lock()
+
+    @app.before_request
+    def check_token():
+        if request.endpoint != 'healthz' and not token_matches(request.headers.get(TOKEN_HEADER), token):
+            return jsonify({'error': 'Invalid cluster token'}), 401
+
+    def task_directory(task_id):
+        """Directory of an existing task, refusing ids that could leave ``work_root``"""
+        root = os.path.realpath(work_root)
+        directory = os.path.realpath(os.path.join(root, task_id))
+        if not TASK_ID_PATTERN.match(task_id) or os.path.dirname(directory) != root:
+            abort(404)
+        return directory
+
+    def new_task():
+        task_id = uuid.uuid4().hex
+        directory = os.path.join(work_root, task_id)
+        os.makedirs(directory)
+        return task_id, directory
+
+    def run(handler):
+        with lock:
+            state['active'] += 1
+        try:
+            result = handler()
+            with lock:
+                state['completed'] += 1
+            return jsonify(result)
+        except Exception as e:
+            with lock:
+                state['failed'] += 1
+            return jsonify({'error': str(e)}), 400 if isinstance(e, ValueError) else 500
+        finally:
+            with lock:
+                state['active'] -= 1
+
+    @app.route('/healthz')
+    def healthz():
+        with lock:
+            return jsonify(dict(state, status='ok', detectors=pool.stats()))
+
+    @app.route('/tasks/video', methods=['POST'])
+    def video_task():
+        from scripts.pipeline import process_file_with_counter
+
+        def handle():
+            if 'segment' not in request.files:
+                raise ValueError("No segment provided")
+            options = json.loads(request.form.get('task') or '{}')
+            task_id, directory = new_task()
+            input_path = os.path.join(directory, "input.mp4")
+            request.files['segment'].save(input_path)
+            output_path = os.path.join(directory, f"{task_id}.mp4")
+            boxes = []
+            with pool.acquire() as counter:
+                max_people_count = process_file_with_counter(
+                    counter, input_path, output_path, 'video',
+                    on_frame=lambda i, people_boxes, t: boxes.append(_plain_boxes(people_boxes)),
+                    encoding=options.get('encoding'), reuse_buffers=True)
+            os.remove(input_path)
+            return {'task_id': task_id, 'frames': len(boxes), 'max_people_count': max_people_count,
+                    'boxes': boxes, 'result_url': f"/results/{task_id}/{task_id}.mp4"}
+        return run(handle)
+
+    @app.route('/tasks/images', methods=['POST'])
+    def image_task():
+        import cv2
+        import numpy as np
+
+        def handle():
+            options = json.loads(request.form.get('task') or '{}')
+            task_id, directory = new_task()
+            uploads = request.files.getlist('images')
+            results = [None] * len(uploads)
+            frames = []
+            batch = []
+            for i, upload in enumerate(uploads):
+                frame = cv2.imdecode(np.frombuffer(upload.read(), np.uint8), cv2.IMREAD_COLOR)
+                if frame is None:
+                    results[i] = {'name': upload.filename, 'error': 'Could not read image file'}
+                    continue
+                frames.append(frame)
+                batch.append(i)
+            if frames:
+                with pool.acquire() as counter:
+                    if options.get('input_size'):
+                        counter.input_size = options['input_size']
+                    try:
+                        all_boxes = counter.detect_people_batch(frames)
+                    finally:
+                        counter.input_size = counter.INPUT_SIZE
+                    drawn = [counter.draw_detections(frame, boxes) for frame, boxes in zip(frames, all_boxes)]
+                for i, people_boxes, (result_frame, people_count) in zip(batch, all_boxes, drawn):
+                    name = f"{i:05d}.jpg"
+                    cv2.imwrite(os.path.join(directory, name), result_frame)
+                    results[i] = {'name': uploads[i].filename, 'people_count': people_count,
+                                  'boxes': _plain_boxes(people_boxes),
+                                  'result_url': f"/results/{task_id}/{name}"}
+            return {'task_id': task_id, 'results': results}
+        return run(handle)
+
+    @app.route('/results/<task_id>/<name>')
+    def task_result(task_id, name):
+        return send_from_directory(task_directory(task_id), name)
+
+    @app.route('/tasks/<task_id>', methods=['DELETE'])
+    def forget_task(task_id):
+        shutil.rmtree(task_directory(task_id), ignore_errors=True)
+        return jsonify({'ok': True})
+
+    app.worker_state = state
+    return app
+
+def remove_stale_tasks(work_root=WORK_ROOT, max_age=TASK_MAX_AGE):
+    """Delete task directories whose results were never fetched"""
+    if not os.path.isdir(work_root):
+        return
+    for name in os.listdir(work_root):
+        path = os.path.join(work_root, name)
+        if time.time() - os.path.getmtime(path) > max_age:
+            shutil.rmtree(path, ignore_errors=True)
+
+def keep_registered(coordinator_url, public_url, capacity, state, token=None):
+    """Register with the coordinator and heartbeat until the process exits"""
+    token = token or CLUSTER_TOKEN
+    worker_id = None
+    while True:
+        try:
+            if worker_id is None:
+                answer = http_json(f"{coordinator_url}/api/cluster/register",
+                                   {'url': public_url, 'capacity': capacity}, token=token)
+                worker_id = answer['worker_id']
+                print(f"✅ Registered with {coordinator_url} as {worker_id}")
+            else:
+                http_json(f"{coordinator_url}/api/cluster/heartbeat", dict(state, worker_id=worker_id),
+                          token=token)
+        except Exception as e:
+            if getattr(e, 'code', None) == 404:
+                worker_id = None  # the coordinator restarted and forgot us
+                continue
+            if getattr(e, 'code', None) == 401:
+                print("❌ Coordinator rejected our CLUSTER_TOKEN")
+            else:
+                print(f"⚠️ Coordinator unreachable: {e}")
+        remove_stale_tasks()
+        time.sleep(HEARTBEAT_SECONDS)
+
+def serve(factory, port, coordinator_url, capacity=1, host='0.0.0.0', public_url=None):
+    """Load ``capacity`` detectors, then serve tasks and join the coordinator's cluster"""
+    pool = DetectorPool(factory, size=capacity)
+    print(f"🔄 Loading {capacity} detector(s)...")
+    pool.warm()
+    app = create_worker_app(pool)
+    public_url = public_url or f"http://{socket.gethostname() if host == '0.0.0.0' else host}:{port}"
+    threading.Thread(target=keep_registered,
+                     args=(coordinator_url.rstrip('/'), public_url, capacity, app.worker_state),
+                     daemon=True).start()
+    app.run(host=host, port=port, threaded=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Cluster worker node')
+    parser.add_argument('--coordinator', required=True, help='Coordinator base URL')
+    parser.add_argument('--port', type=int, default=8091, help='Port to serve tasks on')
+    parser.add_argument('--host', default='0.0.0.0', help='Interface to listen on')
+    parser.add_argument('--public-url', help='URL the coordinator reaches this worker at')
+    parser.add_argument('--capacity', type=int, default=1, help='Detectors kept loaded')
+    parser.add_argument('--detector', choices=['yolo', 'cascade-ssd', 'cascade-tiny'], default='yolo')
+
+    args = parser.parse_args()
+    if not CLUSTER_TOKEN:
+        raise SystemExit("❌ Set CLUSTER_TOKEN to the coordinator's shared secret")
+    public_url = args.public_url
+    if public_url is None and args.coordinator.startswith(('http://127.0.0.1', 'http://localhost')):
+        public_url = f"http://127.0.0.1:{args.port}"
+    serve(make_detector(args.detector), args.port, args.coordinator, args.capacity,
+          args.host, public_url)
+
+if __name__ == "__main__":
+    main()